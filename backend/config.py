@@ -2,7 +2,16 @@ import os
 
 class Config:
     UPLOAD_FOLDER = 'uploads'
-    ALLOWED_EXTENSIONS = {'csv'}
+    ALLOWED_EXTENSIONS = {'csv', 'svg', 'npy', 'crv'}
+    BINARY_EXTENSIONS = {'npy', 'crv'}
+    BINARY_MIMETYPES = {'application/octet-stream', 'application/x-npy', 'application/x-curves'}
+    # Request bodies above this are rejected with 413 before they are read
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_UPLOAD_BYTES', str(64 * 2 ** 20)))
+    # Sampled request capture for offline replay, off unless CAPTURE_SAMPLE_RATE is set
+    CAPTURE_FOLDER = os.environ.get('CAPTURE_FOLDER', 'captures')
+    CAPTURE_SAMPLE_RATE = float(os.environ.get('CAPTURE_SAMPLE_RATE', '0'))
+    CAPTURE_MAX_BYTES = int(os.environ.get('CAPTURE_MAX_BYTES', str(256 * 2 ** 20)))
+    CAPTURE_MAX_FILES = int(os.environ.get('CAPTURE_MAX_FILES', '1000'))
 
 if not os.path.exists(Config.UPLOAD_FOLDER):
     os.makedirs(Config.UPLOAD_FOLDER)
@@ -1,12 +1,14 @@
 from flask import Flask
 from flask_cors import CORS
+from config import Config
 from routes import csv_routes
 import sys
 
 def create_app():
     app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH
     sys.stdout.flush()
-    CORS(app)  # Enable CORS for all routes and origins
+    CORS(app, expose_headers=['X-Result-Id'])  # Enable CORS for all routes and origins
     app.register_blueprint(csv_routes.bp)
     @app.route('/')
     def home():
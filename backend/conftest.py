@@ -0,0 +1 @@
+# Lets tests import the backend packages (utils, services, routes) the way the app does.
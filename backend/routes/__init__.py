@@ -2,4 +2,4 @@ from flask import Blueprint
 
 bp = Blueprint('csv_routes', __name__)
 
-from . import csv_routes
+from . import csv_routes, query_routes
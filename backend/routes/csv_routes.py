@@ -1,9 +1,115 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 from io import StringIO
+import gzip
+import json
+import logging
+import math
+import time
+import zlib
 import pandas as pd
-from services.csv_service import process_csv_data
+from config import Config
+from services.csv_service import process_upload, parse_csv, parse_svg, parse_binary, stream_curves, stage_cache, fit_cache
+from services.shape_export import EXPORTERS
+from services.traffic_capture import TrafficCapture
+from utils.point_codec import decompress, is_point_data, InvalidPointData, PayloadTooLarge
 from . import bp
 
+logger = logging.getLogger(__name__)
+
+# CSV is listed first so clients that accept anything keep the legacy format.
+RESPONSE_FORMATS = ['csv', 'json', 'svg', 'binary']
+BINARY_DTYPES = {'float32', 'float64'}
+
+CONTENT_ENCODINGS = {
+    'gzip': lambda body: gzip.compress(body, compresslevel=6),
+    'deflate': zlib.compress,
+}
+
+traffic_capture = TrafficCapture(Config.CAPTURE_FOLDER, Config.CAPTURE_SAMPLE_RATE,
+                                 max_bytes=Config.CAPTURE_MAX_BYTES, max_files=Config.CAPTURE_MAX_FILES)
+
+def negotiate_format():
+    requested = request.args.get('format')
+    if requested:
+        return requested if requested in EXPORTERS else None
+
+    accept = request.accept_mimetypes
+    return max(RESPONSE_FORMATS, key=lambda fmt: accept[EXPORTERS[fmt][1]])
+
+def negotiate_encoding():
+    accept = request.accept_encodings
+    best = max(CONTENT_ENCODINGS, key=lambda encoding: accept[encoding])
+    return best if accept[best] > 0 else None
+
+def file_extension(file):
+    name = file.filename.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return name.rsplit('.', 1)[-1] if '.' in name else ''
+
+def is_binary_upload(file):
+    return file_extension(file) in Config.BINARY_EXTENSIONS or file.mimetype in Config.BINARY_MIMETYPES
+
+def upload_kind(file, payload):
+    """``csv`` or ``svg`` by extension, otherwise ``binary`` when the payload holds point data.
+
+    Clients such as curl send every file as ``application/octet-stream``, so
+    the mimetype alone never makes a text upload binary.
+    """
+    extension = file_extension(file)
+    if extension in ('csv', 'svg'):
+        return extension
+    return 'binary' if extension in Config.BINARY_EXTENSIONS or is_point_data(payload) else 'csv'
+
+def pipeline_params():
+    """Per-request pipeline parameters; only the RDP ``epsilon`` is exposed."""
+    epsilon = request.args.get('epsilon')
+    if epsilon is None:
+        return {}
+    try:
+        epsilon = float(epsilon)
+    except ValueError:
+        epsilon = -1.0
+    if not (math.isfinite(epsilon) and epsilon >= 0):
+        raise ValueError('epsilon must be a non-negative number')
+    return {'epsilon': epsilon}
+
+def parse_upload(file, payload):
+    kind = upload_kind(file, payload)
+    if kind == 'binary':
+        return parse_binary(payload)
+    if kind == 'svg':
+        return parse_svg(decompress(payload).decode('utf-8'))
+    return parse_csv(decompress(payload).decode('utf-8'))
+
+def ndjson_event(event, data):
+    return json.dumps({'event': event, 'data': data}) + '\n'
+
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+STREAM_FORMATS = {
+    'ndjson': (ndjson_event, 'application/x-ndjson'),
+    'sse': (sse_event, 'text/event-stream'),
+}
+
+def make_response_body(result):
+    headers = {}
+    body = result.encode('utf-8') if isinstance(result, str) else result
+    encoding = negotiate_encoding()
+    if encoding:
+        body = CONTENT_ENCODINGS[encoding](body)
+        headers['Content-Encoding'] = encoding
+        headers['Vary'] = 'Accept, Accept-Encoding'
+    return body, headers
+
+def capture(*record):
+    # A failed capture is logged and dropped, the request itself succeeded
+    try:
+        traffic_capture.record(*record)
+    except Exception:
+        logger.exception('Could not capture request')
+
 @bp.route('/upload_csv', methods=['POST'])
 def upload_csv():
     if 'file' not in request.files:
@@ -14,12 +120,93 @@ def upload_csv():
     if file.filename == '':
         return jsonify({'error': 'No file selected for uploading'}), 400
 
-    if file and file.filename.endswith('.csv'):
+    output_format = negotiate_format()
+    if output_format is None:
+        return jsonify({'error': f'Unsupported response format, expected one of {RESPONSE_FORMATS}'}), 406
+
+    export_options = {}
+    if output_format == 'binary':
+        dtype = request.args.get('dtype', 'float64')
+        if dtype not in BINARY_DTYPES:
+            return jsonify({'error': f'Unsupported dtype, expected one of {sorted(BINARY_DTYPES)}'}), 400
+        export_options['dtype'] = dtype
+
+    try:
+        params = pipeline_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if file and (file_extension(file) in Config.ALLOWED_EXTENSIONS or is_binary_upload(file)):
         try:
-            file_data = file.read().decode('utf-8')
-            result = process_csv_data(file_data)
-            return result, 200, {'Content-Type': 'text/csv'}
+            payload = file.read()
+            kind = upload_kind(file, payload)
+            timings, cache_use = ({}, {}) if traffic_capture.sample() else (None, None)
+            start = time.perf_counter()
+            result, result_id = process_upload(kind, payload, output_format, params, timings, cache_use, **export_options)
+            if timings is not None:
+                capture(kind, file.filename, payload, output_format, params, export_options, timings,
+                        time.perf_counter() - start, result, cache_use)
+            body, headers = make_response_body(result)
+            headers['Content-Type'] = EXPORTERS[output_format][1]
+            headers['X-Result-Id'] = result_id
+            return body, 200, headers
+        except PayloadTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except InvalidPointData as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     else:
-        return jsonify({'error': 'Unsupported file type, only CSV allowed'}), 400
+        return jsonify({'error': 'Unsupported file type, only CSV, SVG or binary point data allowed'}), 400
+
+@bp.route('/upload_csv/stream', methods=['POST'])
+def upload_csv_stream():
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file part in the request'}), 400
+
+    file = request.files['file']
+
+    if file.filename == '':
+        return jsonify({'error': 'No file selected for uploading'}), 400
+
+    if not (file_extension(file) in Config.ALLOWED_EXTENSIONS or is_binary_upload(file)):
+        return jsonify({'error': 'Unsupported file type, only CSV, SVG or binary point data allowed'}), 400
+
+    # Uncompressed on purpose, a compressor would hold events back until its buffer fills
+    stream_format = request.args.get('format')
+    if stream_format is None:
+        stream_format = 'sse' if request.accept_mimetypes.best == 'text/event-stream' else 'ndjson'
+    if stream_format not in STREAM_FORMATS:
+        return jsonify({'error': f'Unsupported stream format, expected one of {sorted(STREAM_FORMATS)}'}), 406
+    encode_event, mimetype = STREAM_FORMATS[stream_format]
+
+    try:
+        params = pipeline_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        curves = parse_upload(file, file.read())
+    except PayloadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except InvalidPointData as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    def generate():
+        try:
+            for event, data in stream_curves(curves, params):
+                yield encode_event(event, data)
+        except Exception as e:
+            yield encode_event('error', {'error': str(e)})
+
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={'Cache-Control': 'no-cache'})
+
+@bp.app_errorhandler(413)
+def request_too_large(e):
+    return jsonify({'error': f'Upload larger than {request.max_content_length} bytes'}), 413
+
+@bp.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'stages': stage_cache.stats(), 'fits': fit_cache.stats()})
@@ -0,0 +1,36 @@
+from flask import request, jsonify
+from services.csv_service import result_store
+from . import bp
+
+def float_args(*names):
+    values = []
+    for name in names:
+        value = request.args.get(name, type=float)
+        if value is None:
+            raise ValueError(f'Missing or non-numeric query parameter: {name}')
+        values.append(value)
+    return values
+
+def query_result(result_id, query):
+    index = result_store.get(result_id)
+    if index is None:
+        return jsonify({'error': 'Unknown or expired result id'}), 404
+    try:
+        return jsonify({'shapes': query(index)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/results/<result_id>/shapes/at', methods=['GET'])
+def shapes_at(result_id):
+    def query(index):
+        x, y = float_args('x', 'y')
+        return index.at(x, y, tolerance=request.args.get('tolerance', 0.0, type=float))
+    return query_result(result_id, query)
+
+@bp.route('/results/<result_id>/shapes/nearest', methods=['GET'])
+def nearest_shape(result_id):
+    return query_result(result_id, lambda index: index.nearest(*float_args('x', 'y')))
+
+@bp.route('/results/<result_id>/shapes/within', methods=['GET'])
+def shapes_within(result_id):
+    return query_result(result_id, lambda index: index.within(*float_args('min_x', 'min_y', 'max_x', 'max_y')))
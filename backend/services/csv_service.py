@@ -4,131 +4,83 @@ from utils.curve_processing import *
 from utils.polygon_detection import *
 from utils.segment_processing import *
 from utils.svg_processing import *
+from utils.symmetry_detection import *
+from utils.occlusion_completion import *
+from utils.point_codec import *
+from services.shape_export import *
+from services.pipeline import *
+from services.spatial_index import *
 import numpy as np
 import matplotlib.pyplot as plt
 from collections import defaultdict
-import csv
-from io import StringIO 
-
-def process_csv_data(csv_data: str):
-    svg_processor = SVGProcessor(csv_data)
-    svg_processor.extract_points_from_csv()
 
+def group_points(all_points):
     curves = defaultdict(list)
-    for point in svg_processor.all_points:
+    for point in all_points:
         curve_index, _, x, y = point
         curves[curve_index].append((x, y))
+    return curves
 
-    curve_processor = CurveProcessor(curves)
-    curve_processor.process()
-    curves = curve_processor.segment_points_dict
-
-    cycle_detector = CycleDetector(curve_processor.updated_curves)
-    cycles, non_cycle_lines = cycle_detector.process_cycles()
-
-    circle_detector = CircleDetector(cycles)
-    remaining_sides = circle_detector.remaining_sides
-    filtered_unused_loops, possible_circles = circle_detector.detect_circles()
-    unique_cycles = circle_detector.unique_cycles
-
-    for polygon in unique_cycles:
-        for i in range(len(polygon)):
-            side = tuple(sorted([tuple(polygon[i]), tuple(polygon[(i + 1) % len(polygon)])]))
-            remaining_sides.add(side)
-
-    for _, _, polygon in possible_circles:
-        for i in range(len(polygon)):
-            side = tuple(sorted([tuple(polygon[i]), tuple(polygon[(i + 1) % len(polygon)])]))
-            if side in remaining_sides:
-                remaining_sides.remove(side)
-
-    for polygon in filtered_unused_loops:
-        for i in range(len(polygon)):
-            side = tuple(sorted([tuple(polygon[i]), tuple(polygon[(i + 1) % len(polygon)])]))
-            if side in remaining_sides:
-                remaining_sides.remove(side)
-
-    segments = list(non_cycle_lines)
-
-    segment_processor = SegmentProcessor(segments)
-    segment_processor.merge_collinear_segments()
-    segment_processor.find_segments_with_common_vertices()
-    rem = segment_processor.revert_to_original_segments()
-    segment_processor.filter_merged_segments()
-    remaining_sides = remaining_sides.union(set(rem))
-
-    polygon_detection = PolygonDetection()
-    vertices_arr, lines_arr = polygon_detection.process_polygons(filtered_unused_loops)
-    valid_polygons, rejected_polygons, remaining_segments = polygon_detection.process_polygons_with_fit(vertices_arr, lines_arr)
-
-    def interpolate_points(p1, p2, num_points=10):
-        x_values = np.linspace(p1[0], p2[0], num_points)
-        y_values = np.linspace(p1[1], p2[1], num_points)
-        return list(zip(x_values, y_values))
-
-    def generate_circle_points(center, radius, num_points):
-        theta = np.linspace(0, 2 * np.pi, num_points)
-        x_values = center[0] + radius * np.cos(theta)
-        y_values = center[1] + radius * np.sin(theta)
-        return list(zip(x_values, y_values))
-
-    def convert_points_to_csv(valid_polygons, possible_circles, remaining_sides, curves, inverse_dict, merged_segments):
-        data = []
-        index = 0  
-
-        for idx, (best_fit_polygon, best_rotation_angle, best_radius, polygon_type) in enumerate(valid_polygons):
-            num_points = best_fit_polygon.shape[0]
-            for i in range(num_points):
-                p1 = best_fit_polygon[i]
-                p2 = best_fit_polygon[(i + 1) % num_points]
-                interpolated_points = interpolate_points(p1, p2)
-                for point in interpolated_points:
-                    data.append([index, '0.0000', point[0], point[1]])
-            index += 1
-
-        # Process possible circles
-        for idx, (center, radius, circle_points) in enumerate(possible_circles):
-            num_circle_points = int(20)
-            circle_points = generate_circle_points(center, radius, num_circle_points)
-            for point in circle_points:
-                data.append([index, '0.0000', point[0], point[1]])
-            index += 1
-
-        # Process remaining sides
-        plotted_curves = set()
-        for side in remaining_sides:
-            if side in inverse_dict:
-                curve_num = inverse_dict[side]
-            elif (side[1], side[0]) in inverse_dict:
-                curve_num = inverse_dict[(side[1], side[0])]
-            else:
-                continue
-
-            if curve_num not in plotted_curves:
-                if curve_num in curves:
-                    points = curves[curve_num]
-                    for i in range(len(points) - 1):
-                        p1 = points[i]
-                        p2 = points[i + 1]
-                        interpolated_points = interpolate_points(p1, p2)
-                        for point in interpolated_points:
-                            data.append([index, '0.0000', point[0], point[1]])
-                    plotted_curves.add(curve_num)
-                    index += 1
-
-        for idx, segment in enumerate(merged_segments):
-            p1, p2 = segment
-            interpolated_points = interpolate_points(p1, p2)
-            for point in interpolated_points:
-                data.append([index, '0.0000', point[0], point[1]])
-            index += 1
-
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['CurveIndex', 'Static', 'X', 'Y'])
-        writer.writerows(data)
-        return output.getvalue()
-
-    csv_result = convert_points_to_csv(valid_polygons, possible_circles, remaining_sides, curves, curve_processor.inverse_dict, segment_processor.filtered_merged_segments)
-    return csv_result
-
+def parse_csv(csv_data: str):
+    svg_processor = SVGProcessor(csv_data)
+    svg_processor.extract_points_from_csv()
+    return group_points(svg_processor.all_points)
+
+def parse_svg(svg_data: str):
+    path_sampler = SVGPathSampler(svg_data)
+    path_sampler.extract_points_from_svg()
+    return group_points(path_sampler.all_points)
+
+def parse_binary(payload: bytes):
+    return columns_to_curves(*decode_points(payload))
+
+# Shared by every request so repeated inputs and parameter sweeps reuse earlier stages,
+# bounded by the points it holds so a few huge uploads cannot fill the server's memory
+stage_cache = StageCache(max_points=2 ** 20)
+# Fits of recurring shapes, shared by every request
+fit_cache = FitCache()
+# Recent results kept for the spatial query routes, bounded by their points like the stage cache
+result_store = ResultStore(max_points=2 ** 20)
+
+def extract_shapes(curves, timings=None, cache_use=None, **params):
+    """Run the cached pipeline, filling ``timings`` and ``cache_use`` when given so
+    timed requests are measured on the path every other request takes."""
+    pipeline = Pipeline(cache=stage_cache, fit_cache=fit_cache, **params)
+    result = pipeline.run(curves)
+    if timings is not None:
+        timings.update(pipeline.timings)
+    if cache_use is not None:
+        cache_use.update(pipeline.cache_use())
+    return result
+
+def process_curves(curves, output_format: str = 'csv', params=None, timings=None, cache_use=None, **export_options):
+    export, _ = EXPORTERS[output_format]
+    result = extract_shapes(curves, timings, cache_use, **(params or {}))
+    return export(result, **export_options), result_store.put(result['shapes'])
+
+def stream_curves(curves, params=None):
+    """``Pipeline.stream`` events, with the stored result's id added to the final ``done`` event."""
+    shapes = []
+    for event, data in Pipeline(cache=stage_cache, fit_cache=fit_cache, **(params or {})).stream(curves):
+        if event == 'shape':
+            shapes.append(data)
+        elif event == 'done':
+            data = {**data, 'result_id': result_store.put(shapes), 'shapes': len(shapes)}
+        yield event, data
+
+def process_csv_data(csv_data: str, output_format: str = 'csv', params=None, timings=None, cache_use=None, **export_options):
+    return process_curves(parse_csv(csv_data), output_format, params, timings, cache_use, **export_options)
+
+def process_svg_data(svg_data: str, output_format: str = 'csv', params=None, timings=None, cache_use=None, **export_options):
+    return process_curves(parse_svg(svg_data), output_format, params, timings, cache_use, **export_options)
+
+def process_binary_data(payload: bytes, output_format: str = 'csv', params=None, timings=None, cache_use=None, **export_options):
+    return process_curves(parse_binary(payload), output_format, params, timings, cache_use, **export_options)
+
+def process_upload(kind: str, payload: bytes, output_format: str = 'csv', params=None, timings=None, cache_use=None, **export_options):
+    """Process a raw upload body of ``kind`` ``csv``, ``svg`` (both possibly gzip/zlib compressed) or ``binary``."""
+    if kind == 'binary':
+        return process_binary_data(payload, output_format, params, timings, cache_use, **export_options)
+    if kind == 'svg':
+        return process_svg_data(decompress(payload).decode('utf-8'), output_format, params, timings, cache_use, **export_options)
+    return process_csv_data(decompress(payload).decode('utf-8'), output_format, params, timings, cache_use, **export_options)
@@ -0,0 +1,463 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from utils.cycle_detection import CycleDetector
+from utils.circle_detection import CircleDetector
+from utils.curve_processing import CurveProcessor
+from utils.polygon_detection import PolygonDetection
+from utils.segment_processing import SegmentProcessor
+from utils.symmetry_detection import SymmetryDetector
+from utils.occlusion_completion import OcclusionCompleter
+from utils.conic_fitting import StrokeClassifier
+from utils.point_codec import curves_to_columns
+from services.shape_export import (polygon_shape, circle_shape, polyline_shape, bezier_shape, line_shape, arc_shape,
+                                   elliptical_arc_shape)
+
+DEFAULT_PARAMS = {
+    'epsilon': 5.0,
+    'threshold': 5.0,
+    'decimation_fraction': 0.1,
+    'mse_threshold': 50,
+    'error_threshold': 150,
+    'stroke_tolerance': 1.5,
+    'seed': 0,
+}
+
+# Parameters each stage reads directly; a stage's cache key also covers everything upstream of it.
+STAGE_PARAMS = {
+    'importance': (),
+    'curves': ('epsilon', 'threshold', 'decimation_fraction'),
+    'cycles': (),
+    'circle_fits': ('seed',),
+    'circles': ('mse_threshold',),
+    'segments': (),
+    'polygon_fits': (),
+    'polygons': ('error_threshold',),
+}
+
+
+def point_count(value):
+    """Number of 2-D points held by a cached value, which is what its memory grows with."""
+    if isinstance(value, np.ndarray):
+        # 1-D arrays hold one value per point, such as the RDP importance
+        return len(value) if value.ndim == 1 else value.size // 2
+    if isinstance(value, dict):
+        return sum(point_count(key) + point_count(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)) and value:
+        if isinstance(value[0], (int, float, np.number)):
+            return max(len(value) // 2, 1)
+        if isinstance(value[0], (list, tuple)) and value[0] and isinstance(value[0][0], (int, float, np.number)):
+            # a run of points, counted without visiting every one
+            return len(value)
+        return sum(point_count(item) for item in value)
+    return 0
+
+
+class StageCache:
+    """Bounded LRU of stage outputs shared across pipeline runs.
+
+    Holds at most ``max_entries`` values and, when ``max_points`` is set, at
+    most that many points across them as counted by ``point_count``. A value
+    larger than ``max_points`` on its own is not cached. Cached values are
+    shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=256, max_points=None):
+        self.max_entries = max_entries
+        self.max_points = max_points
+        self.entries = OrderedDict()
+        self.points = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return True, self.entries[key][0]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        size = 0 if self.max_points is None else point_count(value)
+        with self.lock:
+            if key in self.entries:
+                self.points -= self.entries.pop(key)[1]
+            if self.max_points is not None and size > self.max_points:
+                return
+            self.entries[key] = (value, size)
+            self.points += size
+            while len(self.entries) > self.max_entries or (self.max_points is not None and self.points > self.max_points):
+                self.points -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.points = 0
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'points': self.points,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+def canonical_ring(points, centroid, scale, resolution):
+    """Quantized points in the ``(centroid, scale)`` frame, from the same start vertex and direction whatever the input's,
+    and the order of ``points`` they were read in."""
+    rows = [tuple(row) for row in np.round((points - centroid) / (scale * resolution)).astype(np.int64).tolist()]
+    first = min(rows)
+    candidates = []
+    for i in [i for i, row in enumerate(rows) if row == first]:
+        forward = [(i + k) % len(rows) for k in range(len(rows))]
+        backward = [(i - k) % len(rows) for k in range(len(rows))]
+        candidates += [(tuple(rows[j] for j in order), order) for order in (forward, backward)]
+    return min(candidates)
+
+
+def ring_signature(points, centroid, scale, resolution):
+    return canonical_ring(points, centroid, scale, resolution)[0]
+
+
+class FitCache(StageCache):
+    """LRU of circle and polygon fits keyed by translation- and scale-normalized cycle signatures.
+
+    Repeated shapes at other positions and sizes, within one drawing or
+    across requests, reuse the first fit of their shape: fits are stored in
+    the frame of the fitted points (centroid at the origin, unit RMS radius)
+    and mapped back on a hit. ``resolution`` is the quantization step of that
+    frame, so shapes that differ by less share a fit. Circle fits sample
+    vertex triples from the ring's canonical start vertex with a generator
+    seeded by the signature, so a hit returns what a fresh fit of the first
+    copy would and no fit depends on the order cycles arrive in. Which copy
+    came first still shows, shifting a shared fit by up to ``resolution``
+    of the shape's scale.
+    """
+
+    def __init__(self, max_entries=1024, resolution=0.01):
+        super().__init__(max_entries)
+        self.resolution = resolution
+
+    def frame(self, points):
+        centroid = points.mean(axis=0)
+        scale = np.sqrt(np.mean(np.sum((points - centroid) ** 2, axis=1)))
+        return centroid, scale
+
+    def circle(self, polygon, seed, fit, lookups=None):
+        """``fit(polygon, rng)`` -> ``(center, radius, mse)``, cached on the cycle's vertex ring.
+
+        ``lookups`` maps each key to whether its first lookup was a hit, so a
+        caller can tell fits reused from earlier requests from its own repeats.
+        """
+        ring = np.asarray(polygon, dtype=float)
+        if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+            ring = ring[:-1]
+        centroid, scale = self.frame(ring)
+        signature, order = canonical_ring(ring, centroid, scale, self.resolution) if scale > 0 else ((), [])
+        digest = int.from_bytes(hashlib.sha256(repr(signature).encode()).digest()[:8], 'little')
+        rng = np.random.default_rng(None if seed is None else [seed, digest])
+        if not scale > 0:
+            return fit(polygon, rng)
+
+        key = ('circle', seed, signature)
+        found, value = self.get(key)
+        if lookups is not None:
+            lookups.setdefault(key, found)
+        if not found:
+            center, radius, mse = fit(np.concatenate([ring[order], ring[order[:1]]]), rng)
+            value = (None if center is None else (center - centroid) / scale,
+                     None if radius is None else radius / scale, mse / scale ** 2)
+            self.put(key, value)
+            return center, radius, mse
+
+        center, radius, mse = value
+        return (None if center is None else centroid + center * scale,
+                None if radius is None else radius * scale, mse * scale ** 2)
+
+    def polygon(self, vertices, lines, fit, lookups=None):
+        """``fit(vertices, lines)`` -> ``(vertices, rotation, radius, type)``, cached on the reduced vertices and the drawn ring."""
+        vertices = np.asarray(vertices, dtype=float)
+        centroid, scale = self.frame(vertices)
+        if not scale > 0:
+            return fit(vertices, lines)
+
+        # the reduced vertices are an unordered set, the drawn ring keeps the sides the template is scored against
+        corners = tuple(sorted(tuple(row) for row in np.round((vertices - centroid) / (scale * self.resolution)).astype(np.int64).tolist()))
+        ring = np.array([line[0] for line in lines], dtype=float)
+        key = ('polygon', corners, ring_signature(ring, centroid, scale, self.resolution))
+        found, value = self.get(key)
+        if lookups is not None:
+            lookups.setdefault(key, found)
+        if not found:
+            polygon, rotation, radius, polygon_type = fit(vertices, lines)
+            self.put(key, ((polygon - centroid) / scale, rotation, None if radius is None else radius / scale, polygon_type))
+            return polygon, rotation, radius, polygon_type
+
+        polygon, rotation, radius, polygon_type = value
+        return centroid + polygon * scale, rotation, None if radius is None else radius * scale, polygon_type
+
+
+def hash_curves(curves):
+    curve_ids, offsets, xs, ys = curves_to_columns(curves)
+    digest = hashlib.sha1()
+    for column in (curve_ids, offsets, xs, ys):
+        digest.update(np.ascontiguousarray(column).tobytes())
+    return digest.hexdigest()
+
+
+STROKE_SHAPES = {
+    'line': line_shape,
+    'arc': arc_shape,
+    'elliptical_arc': elliptical_arc_shape,
+    'polyline': polyline_shape,
+}
+
+
+class Pipeline:
+    """``process_csv_data`` split into explicitly keyed stages.
+
+    Each stage is cached under the input hash plus the parameters of that
+    stage and every stage upstream of it, so changing a downstream threshold
+    reuses the RDP, snapping and cycle results already computed. RDP
+    importance does not depend on epsilon, so a new epsilon only re-runs the
+    masking and everything after it. For the same reason it is computed on
+    the raw strokes, before the epsilon-dependent decimation. ``fit_cache``
+    shares circle and polygon fits between cycles of the same shape,
+    whatever the input.
+    """
+
+    def __init__(self, cache=None, fit_cache=None, **params):
+        unknown = set(params) - set(DEFAULT_PARAMS)
+        if unknown:
+            raise ValueError(f'Unknown pipeline parameters: {sorted(unknown)}')
+        self.params = {**DEFAULT_PARAMS, **params}
+        self.cache = cache
+        self.fit_cache = fit_cache
+        self.reset_profile()
+
+    def reset_profile(self):
+        # seconds and cache hit per stage, and the first lookup of every fit key, for the current run
+        self.timings = {}
+        self.cache_hits = {}
+        self.fit_lookups = {}
+
+    def cache_use(self):
+        """Stage name -> whether it came from the stage cache, and how many fits earlier requests left in the fit cache."""
+        return {'stages': dict(self.cache_hits), 'reused_fits': sum(self.fit_lookups.values())}
+
+    def stage(self, name, parent_keys, compute):
+        key = (name,) + tuple(parent_keys) + tuple(self.params[p] for p in STAGE_PARAMS[name])
+        start = time.perf_counter()
+        if self.cache is not None:
+            found, value = self.cache.get(key)
+            self.cache_hits[name] = found
+            if found:
+                self.timings[name] = time.perf_counter() - start
+                return key, value
+
+        value = compute()
+        if self.cache is not None:
+            self.cache.put(key, value)
+        self.timings[name] = time.perf_counter() - start
+        return key, value
+
+    def rdp_importance(self, curves):
+        return CurveProcessor(curves).compute_importance()
+
+    def process_curves(self, curves, importance):
+        curve_processor = CurveProcessor(curves, epsilon=self.params['epsilon'], threshold=self.params['threshold'],
+                                         decimation_fraction=self.params['decimation_fraction'], importance=importance)
+        curve_processor.process()
+        return {
+            'updated_curves': curve_processor.updated_curves,
+            'segment_points': curve_processor.segment_points_dict,
+            'inverse_dict': curve_processor.inverse_dict,
+            'decimation_stats': curve_processor.decimation_stats,
+        }
+
+    def detect_cycles(self, curve_stage):
+        cycle_detector = CycleDetector(curve_stage['updated_curves'])
+        cycles, non_cycle_lines = cycle_detector.process_cycles()
+        return cycles, non_cycle_lines
+
+    def fit_circles(self, cycles):
+        circle_detector = CircleDetector(cycles, seed=self.params['seed'])
+        if self.fit_cache is None:
+            return circle_detector.fit_circles()
+        return [self.fit_cache.circle(polygon, self.params['seed'], circle_detector.best_fit_circle, self.fit_lookups)
+                for polygon in cycles]
+
+    def select_circles(self, cycles, fits):
+        circle_detector = CircleDetector(cycles, mse_threshold=self.params['mse_threshold'])
+        filtered_unused_loops, possible_circles = circle_detector.detect_circles(fits)
+        return filtered_unused_loops, possible_circles, tuple(circle_detector.remaining_sides)
+
+    def merge_segments(self, non_cycle_lines):
+        segment_processor = SegmentProcessor(list(non_cycle_lines))
+        segment_processor.merge_collinear_segments()
+        segment_processor.find_segments_with_common_vertices()
+        rem = segment_processor.revert_to_original_segments()
+        segment_processor.filter_merged_segments()
+        return rem, segment_processor.filtered_merged_segments
+
+    def fit_polygons(self, loops):
+        polygon_detection = PolygonDetection()
+        vertices_arr, lines_arr = polygon_detection.process_polygons(loops)
+        if self.fit_cache is None:
+            return polygon_detection.fit_polygons(vertices_arr, lines_arr)
+        return polygon_detection.fit_polygons(
+            vertices_arr, lines_arr, lambda vertices, lines: self.fit_cache.polygon(vertices, lines, polygon_detection.fit_polygon, self.fit_lookups))
+
+    def select_polygons(self, fits):
+        polygon_detection = PolygonDetection(error_threshold=self.params['error_threshold'])
+        valid_polygons, _, _ = polygon_detection.filter_polygon_fits(fits)
+        return valid_polygons, polygon_detection.polygon_contours
+
+    def with_symmetry(self, shapes, contours):
+        # Symmetry is measured on the drawn contours, so irregular shapes are scored as drawn
+        for shape, symmetry in zip(shapes, SymmetryDetector().detect_all(contours)):
+            shape['symmetry'] = symmetry
+        return shapes
+
+    def polygon_shapes(self, polygon_stage):
+        valid_polygons, polygon_contours = polygon_stage
+        shapes = [polygon_shape(best_fit_polygon, best_rotation_angle, best_radius, polygon_type)
+                  for best_fit_polygon, best_rotation_angle, best_radius, polygon_type in valid_polygons]
+        return self.with_symmetry(shapes, polygon_contours)
+
+    def circle_shapes(self, circle_stage):
+        _, possible_circles, _ = circle_stage
+        shapes = [circle_shape(center, radius) for center, radius, _ in possible_circles]
+        return self.with_symmetry(shapes, [polygon for _, _, polygon in possible_circles])
+
+    def leftover_shapes(self, curve_stage, circle_stage, segment_stage):
+        _, _, remaining_sides = circle_stage
+        rem, merged_segments = segment_stage
+        # ordered and deduplicated, so strokes come out in the same order on every run
+        remaining_sides = dict.fromkeys(remaining_sides + tuple(rem))
+
+        curves = curve_stage['segment_points']
+        inverse_dict = curve_stage['inverse_dict']
+        open_strokes = []
+        plotted_curves = set()
+        for side in remaining_sides:
+            if side in inverse_dict:
+                curve_num = inverse_dict[side]
+            elif (side[1], side[0]) in inverse_dict:
+                curve_num = inverse_dict[(side[1], side[0])]
+            else:
+                continue
+
+            if curve_num not in plotted_curves and curve_num in curves:
+                open_strokes.append(curves[curve_num])
+                plotted_curves.add(curve_num)
+
+        open_strokes += merged_segments
+
+        occlusion_completer = OcclusionCompleter(open_strokes)
+        completions = occlusion_completer.complete()
+
+        # completions are solved on the drawn strokes, the strokes themselves are emitted as fitted primitives
+        stroke_classifier = StrokeClassifier(open_strokes, tolerance=self.params['stroke_tolerance'])
+        shapes = [STROKE_SHAPES[kind](*parameters) for _, kind, parameters in stroke_classifier.classify_chains()]
+        shapes += [bezier_shape(control_points) for control_points in completions]
+        return shapes
+
+    def build_shapes(self, curve_stage, circle_stage, segment_stage, polygon_stage):
+        return (self.polygon_shapes(polygon_stage) + self.circle_shapes(circle_stage)
+                + self.leftover_shapes(curve_stage, circle_stage, segment_stage))
+
+    def run(self, curves, input_hash=None):
+        self.reset_profile()
+        input_hash = input_hash or hash_curves(curves)
+
+        importance_key, importance = self.stage('importance', [input_hash], lambda: self.rdp_importance(curves))
+        curve_key, curve_stage = self.stage('curves', [importance_key], lambda: self.process_curves(curves, importance))
+        cycle_key, (cycles, non_cycle_lines) = self.stage('cycles', [curve_key], lambda: self.detect_cycles(curve_stage))
+        fit_key, circle_fits = self.stage('circle_fits', [cycle_key], lambda: self.fit_circles(cycles))
+        circle_key, circle_stage = self.stage('circles', [fit_key], lambda: self.select_circles(cycles, circle_fits))
+        _, segment_stage = self.stage('segments', [cycle_key], lambda: self.merge_segments(non_cycle_lines))
+        polygon_fit_key, polygon_fits = self.stage('polygon_fits', [circle_key], lambda: self.fit_polygons(circle_stage[0]))
+        _, polygon_stage = self.stage('polygons', [polygon_fit_key], lambda: self.select_polygons(polygon_fits))
+
+        start = time.perf_counter()
+        shapes = self.build_shapes(curve_stage, circle_stage, segment_stage, polygon_stage)
+        self.timings['shapes'] = time.perf_counter() - start
+
+        return {'shapes': shapes, 'stats': {'decimation': curve_stage['decimation_stats']}}
+
+
+    def stream(self, curves, input_hash=None):
+        """Yield ``(event, data)`` as stages finish: the snapped strokes, then every circle,
+        polygon and leftover stroke as a ``shape`` event, then ``done`` with the stats.
+
+        The shapes streamed are those ``run`` returns, circles merely arrive before polygons.
+        """
+        self.reset_profile()
+        input_hash = input_hash or hash_curves(curves)
+
+        importance_key, importance = self.stage('importance', [input_hash], lambda: self.rdp_importance(curves))
+        curve_key, curve_stage = self.stage('curves', [importance_key], lambda: self.process_curves(curves, importance))
+        yield 'strokes', [polyline_shape(points) for points in curve_stage['updated_curves'].values()]
+
+        cycle_key, (cycles, non_cycle_lines) = self.stage('cycles', [curve_key], lambda: self.detect_cycles(curve_stage))
+        fit_key, circle_fits = self.stage('circle_fits', [cycle_key], lambda: self.fit_circles(cycles))
+        circle_key, circle_stage = self.stage('circles', [fit_key], lambda: self.select_circles(cycles, circle_fits))
+        for shape in self.circle_shapes(circle_stage):
+            yield 'shape', shape
+
+        _, segment_stage = self.stage('segments', [cycle_key], lambda: self.merge_segments(non_cycle_lines))
+        polygon_fit_key, polygon_fits = self.stage('polygon_fits', [circle_key], lambda: self.fit_polygons(circle_stage[0]))
+        _, polygon_stage = self.stage('polygons', [polygon_fit_key], lambda: self.select_polygons(polygon_fits))
+        for shape in self.polygon_shapes(polygon_stage):
+            yield 'shape', shape
+
+        start = time.perf_counter()
+        for shape in self.leftover_shapes(curve_stage, circle_stage, segment_stage):
+            yield 'shape', shape
+        self.timings['shapes'] = time.perf_counter() - start
+
+        yield 'done', {'stats': {'decimation': curve_stage['decimation_stats']}}
+
+def parameter_grid(grid):
+    """Expand ``{name: [values]}`` with upstream parameters varying slowest, so consecutive runs share stages."""
+    order = [p for stage in STAGE_PARAMS.values() for p in stage]
+    names = sorted(grid, key=lambda name: order.index(name) if name in order else len(order))
+    for values in itertools.product(*(grid[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def sweep(inputs, grid, cache=None, fit_cache=None):
+    """Run every parameter combination over ``{name: curves}`` and summarise each result."""
+    cache = cache if cache is not None else StageCache()
+    hashes = {name: hash_curves(curves) for name, curves in inputs.items()}
+    rows = []
+
+    for params in parameter_grid(grid):
+        for name, curves in inputs.items():
+            pipeline = Pipeline(cache=cache, fit_cache=fit_cache, **params)
+            start = time.perf_counter()
+            try:
+                result = pipeline.run(curves, input_hash=hashes[name])
+            except Exception as e:
+                rows.append({'input': name, **params, 'elapsed': time.perf_counter() - start, 'error': str(e)})
+                continue
+            elapsed = time.perf_counter() - start
+
+            counts = {}
+            for shape in result['shapes']:
+                counts[shape['type']] = counts.get(shape['type'], 0) + 1
+            rows.append({'input': name, **params, 'elapsed': elapsed, 'shapes': len(result['shapes']), **counts})
+
+    return rows, cache.stats()
@@ -0,0 +1,198 @@
+import csv
+import json
+from io import StringIO
+import numpy as np
+import svgwrite
+from utils.point_codec import encode_frame
+
+def interpolate_points(p1, p2, num_points=10):
+    x_values = np.linspace(p1[0], p2[0], num_points)
+    y_values = np.linspace(p1[1], p2[1], num_points)
+    return list(zip(x_values, y_values))
+
+def generate_circle_points(center, radius, num_points):
+    theta = np.linspace(0, 2 * np.pi, num_points)
+    x_values = center[0] + radius * np.cos(theta)
+    y_values = center[1] + radius * np.sin(theta)
+    return list(zip(x_values, y_values))
+
+def polygon_shape(vertices, rotation, radius, polygon_type):
+    return {
+        'type': polygon_type,
+        'vertices': [[float(x), float(y)] for x, y in vertices],
+        'rotation': float(rotation),
+        'radius': None if radius is None else float(radius),
+    }
+
+def circle_shape(center, radius):
+    return {
+        'type': 'circle',
+        'center': [float(center[0]), float(center[1])],
+        'radius': float(radius),
+    }
+
+def polyline_shape(points):
+    return {
+        'type': 'polyline',
+        'points': [[float(x), float(y)] for x, y in points],
+    }
+
+def bezier_shape(control_points):
+    return {
+        'type': 'bezier',
+        'points': [[float(x), float(y)] for x, y in control_points],
+    }
+
+def line_shape(start, end):
+    return {
+        'type': 'line',
+        'points': [[float(start[0]), float(start[1])], [float(end[0]), float(end[1])]],
+    }
+
+def arc_shape(center, radius, start_angle, sweep):
+    return {
+        'type': 'arc',
+        'center': [float(center[0]), float(center[1])],
+        'radius': float(radius),
+        'start_angle': float(start_angle),
+        'sweep': float(sweep),
+    }
+
+def elliptical_arc_shape(center, radii, rotation, start_angle, sweep):
+    """Angles are eccentric anomalies measured on the ellipse's own axes, ``rotation`` is in radians."""
+    return {
+        'type': 'elliptical_arc',
+        'center': [float(center[0]), float(center[1])],
+        'radii': [float(radii[0]), float(radii[1])],
+        'rotation': float(rotation),
+        'start_angle': float(start_angle),
+        'sweep': float(sweep),
+    }
+
+def sample_arc(center, radii, rotation, start_angle, sweep, num_points=20):
+    t = start_angle + np.linspace(0, 1, num_points) * sweep
+    local = np.column_stack([radii[0] * np.cos(t), radii[1] * np.sin(t)])
+    cos_r, sin_r = np.cos(rotation), np.sin(rotation)
+    points = np.asarray(center) + local @ np.array([[cos_r, sin_r], [-sin_r, cos_r]])
+    return list(zip(points[:, 0], points[:, 1]))
+
+def sample_cubic_bezier(control_points, num_points=10):
+    p0, p1, p2, p3 = np.asarray(control_points, dtype=float)
+    t = np.linspace(0, 1, num_points)[:, None]
+    points = (1 - t) ** 3 * p0 + 3 * (1 - t) ** 2 * t * p1 + 3 * (1 - t) * t ** 2 * p2 + t ** 3 * p3
+    return list(zip(points[:, 0], points[:, 1]))
+
+def shape_to_points(shape):
+    """Densify a shape into the point list used by the CSV format."""
+    if shape['type'] == 'circle':
+        return generate_circle_points(shape['center'], shape['radius'], 20)
+
+    if shape['type'] == 'bezier':
+        return sample_cubic_bezier(shape['points'])
+
+    if shape['type'] == 'arc':
+        radius = shape['radius']
+        return sample_arc(shape['center'], (radius, radius), 0.0, shape['start_angle'], shape['sweep'])
+
+    if shape['type'] == 'elliptical_arc':
+        return sample_arc(shape['center'], shape['radii'], shape['rotation'], shape['start_angle'], shape['sweep'])
+
+    if shape['type'] in ('polyline', 'line'):
+        points = shape['points']
+        pairs = zip(points[:-1], points[1:])
+    else:
+        points = shape['vertices']
+        pairs = zip(points, points[1:] + points[:1])
+
+    return [point for p1, p2 in pairs for point in interpolate_points(p1, p2)]
+
+def shapes_to_csv(result):
+    data = []
+    for index, shape in enumerate(result['shapes']):
+        for point in shape_to_points(shape):
+            data.append([index, '0.0000', point[0], point[1]])
+
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['CurveIndex', 'Static', 'X', 'Y'])
+    writer.writerows(data)
+    return output.getvalue()
+
+def shapes_to_json(result):
+    return json.dumps(result)
+
+def shape_bounds(shapes):
+    xs, ys = [], []
+    for shape in shapes:
+        if shape['type'] == 'circle':
+            (cx, cy), r = shape['center'], shape['radius']
+            xs += [cx - r, cx + r]
+            ys += [cy - r, cy + r]
+        elif shape['type'] in ('arc', 'elliptical_arc'):
+            points = shape_to_points(shape)
+            xs += [p[0] for p in points]
+            ys += [p[1] for p in points]
+        else:
+            points = shape['vertices'] if 'vertices' in shape else shape['points']
+            xs += [p[0] for p in points]
+            ys += [p[1] for p in points]
+    if not xs:
+        return 0.0, 0.0, 0.0, 0.0
+    return min(xs), min(ys), max(xs), max(ys)
+
+def polyline_path_data(points):
+    coords = [f'{x:.3f},{y:.3f}' for x, y in points]
+    return 'M ' + coords[0] + ''.join(' L ' + c for c in coords[1:])
+
+def bezier_path_data(points):
+    (x0, y0), *controls = points
+    return f'M {x0:.3f},{y0:.3f} C ' + ' '.join(f'{x:.3f},{y:.3f}' for x, y in controls)
+
+def arc_path_data(shape):
+    """One SVG elliptical arc command per half of the sweep, so no single command is ambiguous."""
+    if shape['type'] == 'arc':
+        radii, rotation = (shape['radius'], shape['radius']), 0.0
+    else:
+        radii, rotation = shape['radii'], shape['rotation']
+    points = sample_arc(shape['center'], radii, rotation, shape['start_angle'], shape['sweep'], num_points=3)
+    sweep_flag = 1 if shape['sweep'] > 0 else 0
+    (x0, y0), *ends = points
+    arcs = ''.join(f' A {radii[0]:.3f},{radii[1]:.3f} {np.degrees(rotation):.3f} 0 {sweep_flag} {x:.3f},{y:.3f}'
+                   for x, y in ends)
+    return f'M {x0:.3f},{y0:.3f}' + arcs
+
+def shapes_to_svg(result, stroke='black', stroke_width=1):
+    shapes = result['shapes']
+    min_x, min_y, max_x, max_y = shape_bounds(shapes)
+    width, height = max(max_x - min_x, 1.0), max(max_y - min_y, 1.0)
+
+    dwg = svgwrite.Drawing(size=(width, height))
+    dwg.viewbox(min_x, min_y, width, height)
+    style = {'fill': 'none', 'stroke': stroke, 'stroke_width': stroke_width}
+
+    for shape in shapes:
+        if shape['type'] == 'circle':
+            dwg.add(dwg.circle(center=shape['center'], r=shape['radius'], **style))
+        elif shape['type'] in ('polyline', 'line'):
+            dwg.add(dwg.path(d=polyline_path_data(shape['points']), **style))
+        elif shape['type'] in ('arc', 'elliptical_arc'):
+            dwg.add(dwg.path(d=arc_path_data(shape), **style))
+        elif shape['type'] == 'bezier':
+            dwg.add(dwg.path(d=bezier_path_data(shape['points']), **style))
+        else:
+            dwg.add(dwg.polygon(points=shape['vertices'], **style))
+
+    return dwg.tostring()
+
+def shapes_to_binary(result, dtype=np.float64):
+    point_lists = [shape_to_points(shape) for shape in result['shapes']]
+    offsets = np.r_[0, np.cumsum([len(points) for points in point_lists])]
+    points = np.array([point for points in point_lists for point in points], dtype=np.float64).reshape(-1, 2)
+    return encode_frame(np.arange(len(point_lists)), offsets, points[:, 0], points[:, 1], dtype=dtype)
+
+EXPORTERS = {
+    'csv': (shapes_to_csv, 'text/csv'),
+    'json': (shapes_to_json, 'application/json'),
+    'svg': (shapes_to_svg, 'image/svg+xml'),
+    'binary': (shapes_to_binary, 'application/x-curves'),
+}
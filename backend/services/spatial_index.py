@@ -0,0 +1,97 @@
+import threading
+import uuid
+from collections import OrderedDict
+from shapely import STRtree, Point, Polygon, LineString, box
+from services.shape_export import sample_cubic_bezier, shape_to_points
+from services.pipeline import point_count
+
+
+def shape_geometry(shape):
+    if shape['type'] == 'circle':
+        return Point(shape['center']).buffer(shape['radius'], quad_segs=16)
+    if shape['type'] == 'bezier':
+        return LineString(sample_cubic_bezier(shape['points'], num_points=32))
+    if shape['type'] in ('polyline', 'line'):
+        return LineString(shape['points']) if len(shape['points']) > 1 else Point(shape['points'][0])
+    if shape['type'] in ('arc', 'elliptical_arc'):
+        return LineString(shape_to_points(shape))
+    return Polygon(shape['vertices'])
+
+
+class ShapeIndex:
+    """STR-packed R-tree over the shapes of one result.
+
+    Shapes are addressed by their position in the result, which is also the
+    order the exporters write them in.
+    """
+
+    def __init__(self, shapes):
+        self.shapes = shapes
+        self.geometries = [shape_geometry(shape) for shape in shapes]
+        self.tree = STRtree(self.geometries)
+
+    def entries(self, ids):
+        return [{'id': int(i), **self.shapes[i]} for i in sorted(int(i) for i in ids)]
+
+    def at(self, x, y, tolerance=0.0):
+        """Shapes containing the point, or passing within ``tolerance`` of it."""
+        probe = Point(x, y)
+        if tolerance > 0:
+            probe = probe.buffer(tolerance)
+        return self.entries(self.tree.query(probe, predicate='intersects'))
+
+    def nearest(self, x, y):
+        """Nearest shapes to the point with their distance; several when tied."""
+        if not self.geometries:
+            return []
+        ids, distances = self.tree.query_nearest(Point(x, y), return_distance=True, all_matches=True)
+        return [{**entry, 'distance': float(distances[0])} for entry in self.entries(ids)]
+
+    def within(self, min_x, min_y, max_x, max_y):
+        """Shapes intersecting the bounding box."""
+        return self.entries(self.tree.query(box(min_x, min_y, max_x, max_y), predicate='intersects'))
+
+
+class ResultStore:
+    """Bounded LRU of recent results, indexed on first query.
+
+    Holds at most ``max_results`` results and, when ``max_points`` is set, at
+    most that many shape points across them as counted by ``point_count``,
+    since a result's index grows with its geometry. A result larger than
+    ``max_points`` on its own is not kept.
+    """
+
+    def __init__(self, max_results=64, max_points=None):
+        self.max_results = max_results
+        self.max_points = max_points
+        self.results = OrderedDict()
+        self.points = 0
+        self.lock = threading.Lock()
+
+    def put(self, shapes):
+        result_id = uuid.uuid4().hex
+        size = 0 if self.max_points is None else point_count(shapes)
+        with self.lock:
+            if self.max_points is not None and size > self.max_points:
+                return result_id
+            self.results[result_id] = (shapes, size)
+            self.points += size
+            while len(self.results) > self.max_results or (self.max_points is not None and self.points > self.max_points):
+                self.points -= self.results.popitem(last=False)[1][1]
+        return result_id
+
+    def get(self, result_id):
+        """The index of a stored result, or None once it has been evicted."""
+        with self.lock:
+            if result_id not in self.results:
+                return None
+            self.results.move_to_end(result_id)
+            entry, size = self.results[result_id]
+            if isinstance(entry, ShapeIndex):
+                return entry
+
+        index = ShapeIndex(entry)
+        with self.lock:
+            if result_id in self.results:
+                self.results[result_id] = (index, size)
+        return index
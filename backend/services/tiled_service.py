@@ -0,0 +1,187 @@
+import csv
+import json
+import numpy as np
+from utils.point_codec import FLOAT_DTYPES, FRAME_HEADER, frame_layout, read_frame_header
+from services.pipeline import Pipeline
+from services.shape_export import shape_to_points
+
+CHUNK_POINTS = 1 << 20
+
+
+def map_point_file(path):
+    """Memory-map a binary point file as (curve_ids, offsets, xs, ys) without reading the points.
+
+    Accepts an uncompressed curve frame or an .npy array in the CSV column
+    layout whose rows are grouped by curve.
+    """
+    if path.endswith('.npy'):
+        array = np.load(path, mmap_mode='r')
+        if array.ndim != 2 or array.shape[1] not in (3, 4):
+            raise ValueError('Expected an (N, 3) or (N, 4) point array')
+        starts = [0]
+        for chunk_start in range(0, len(array), CHUNK_POINTS):
+            # each chunk is compared with the row before it so runs spanning chunks stay whole
+            column = np.asarray(array[max(chunk_start - 1, 0):chunk_start + CHUNK_POINTS, 0])
+            changes = np.flatnonzero(column[1:] != column[:-1]) + max(chunk_start, 1)
+            starts.extend(changes.tolist())
+        offsets = np.array(starts + [len(array)], dtype=np.int64)
+        curve_ids = np.asarray(array[offsets[:-1], 0]).astype(np.int64)
+        return curve_ids, offsets, array[:, -2], array[:, -1]
+
+    with open(path, 'rb') as f:
+        header = f.read(FRAME_HEADER.size)
+    itemsize, n_curves, n_points = read_frame_header(header)
+    ids_offset, offsets_offset, x_offset, y_offset, _ = frame_layout(n_curves, n_points, itemsize)
+    dtype = FLOAT_DTYPES[itemsize]
+    curve_ids = np.memmap(path, dtype='<i4', mode='r', offset=ids_offset, shape=(n_curves,))
+    offsets = np.memmap(path, dtype='<u4', mode='r', offset=offsets_offset, shape=(n_curves + 1,))
+    xs = np.memmap(path, dtype=dtype, mode='r', offset=x_offset, shape=(n_points,))
+    ys = np.memmap(path, dtype=dtype, mode='r', offset=y_offset, shape=(n_points,))
+    return curve_ids, np.asarray(offsets, dtype=np.int64), xs, ys
+
+
+def stroke_pieces(offsets, xs, ys, max_length):
+    """Point ranges and bounding boxes of the pieces strokes are cut into, streamed in chunks of whole strokes.
+
+    A stroke whose bounding box is wider or taller than ``max_length`` is cut
+    wherever its arc length passes a multiple of ``max_length``, other
+    strokes stay whole. Consecutive pieces share their joint point, so the
+    pieces of a stroke still chain end to end. Returns ``(strokes, starts,
+    ends, bounds)``, one row per piece.
+    """
+    n_strokes = len(offsets) - 1
+    pieces = []
+    first = 0
+    while first < n_strokes:
+        last = max(np.searchsorted(offsets, offsets[first] + CHUNK_POINTS, side='right') - 1, first + 1)
+        last = min(last, n_strokes)
+        lo, hi = offsets[first], offsets[last]
+        local = offsets[first:last] - lo
+        chunk_x, chunk_y = np.asarray(xs[lo:hi], dtype=float), np.asarray(ys[lo:hi], dtype=float)
+
+        stroke = np.repeat(np.arange(first, last), np.diff(offsets[first:last + 1]))
+        steps = np.r_[0.0, np.hypot(np.diff(chunk_x), np.diff(chunk_y))]
+        steps[local] = 0.0
+        along = np.cumsum(steps)
+        along -= np.repeat(along[local], np.diff(offsets[first:last + 1]))
+        extent = np.maximum(np.maximum.reduceat(chunk_x, local) - np.minimum.reduceat(chunk_x, local),
+                            np.maximum.reduceat(chunk_y, local) - np.minimum.reduceat(chunk_y, local))
+        piece = np.where(extent[stroke - first] > max_length, np.floor(along / max_length), 0.0)
+        cuts = np.flatnonzero(np.r_[True, (stroke[1:] != stroke[:-1]) | (piece[1:] != piece[:-1])])
+        starts = cuts - np.isin(cuts, local, invert=True)
+        ends = np.r_[cuts[1:], hi - lo]
+
+        bounds = np.empty((len(cuts), 4))
+        for column, (reduce, values) in enumerate([(np.minimum, chunk_x), (np.minimum, chunk_y),
+                                                   (np.maximum, chunk_x), (np.maximum, chunk_y)]):
+            bounds[:, column] = reduce.reduceat(values, cuts)
+            # the shared joint point belongs to the bounds of both pieces
+            joint = starts < cuts
+            bounds[joint, column] = reduce(bounds[joint, column], values[starts[joint]])
+        pieces.append((stroke[cuts], starts + lo, ends + lo, bounds))
+        first = last
+    return tuple(np.concatenate(column) for column in zip(*pieces))
+
+
+def shape_anchor(shape):
+    """Point that decides which tile owns a shape, so shapes seen by several tiles are emitted once."""
+    if shape['type'] == 'circle':
+        return shape['center']
+    if shape['type'] in ('arc', 'elliptical_arc'):
+        return np.mean(shape_to_points(shape), axis=0)
+    points = shape['vertices'] if 'vertices' in shape else shape['points']
+    return np.mean(points, axis=0)
+
+
+class TiledProcessor:
+    """Process a memory-mapped drawing tile by tile so memory scales with tile content, not input size.
+
+    Strokes spanning more than ``tile_size + halo`` are first cut into pieces
+    of at most that length which share their joint points, so a tile never loads
+    the far reaches of a long stroke. Each tile is processed with every piece
+    whose bounding box reaches into the tile grown by ``halo``. A shape is
+    seen whole as long as its pieces come within ``halo`` of the tile holding
+    its anchor, and only that tile writes it, which stitches shapes across
+    borders. ``halo`` should therefore exceed the largest expected shape.
+    """
+
+    def __init__(self, path, tile_size=512.0, halo=128.0, **params):
+        curve_ids, offsets, self.xs, self.ys = map_point_file(path)
+        # dropping empty strokes keeps the remaining ones contiguous, so their starts are still offsets
+        non_empty = np.flatnonzero(np.diff(offsets) > 0)
+        self.curve_ids = curve_ids[non_empty]
+        self.offsets = np.r_[offsets[non_empty], offsets[-1]].astype(np.int64)
+        self.tile_size = tile_size
+        self.halo = halo
+        self.params = params
+        self.stats = {'tiles': 0, 'shapes': 0, 'max_tile_points': 0}
+
+    def tile_pieces(self, bounds):
+        """Every tile whose halo window reaches at least one piece, in row-major order, and the pieces it reaches."""
+        low = np.floor((bounds[:, :2] - self.halo) / self.tile_size).astype(np.int64)
+        high = np.floor((bounds[:, 2:] + self.halo) / self.tile_size).astype(np.int64)
+        span = high - low + 1
+        counts = span[:, 0] * span[:, 1]
+
+        piece = np.repeat(np.arange(len(bounds)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        tiles = np.column_stack([low[piece, 0] + local % span[piece, 0], low[piece, 1] + local // span[piece, 0]])
+
+        order = np.lexsort((piece, tiles[:, 1], tiles[:, 0]))
+        tiles, piece = tiles[order], piece[order]
+        firsts = np.flatnonzero(np.r_[True, np.any(tiles[1:] != tiles[:-1], axis=1)])
+        return tiles[firsts], np.split(piece, firsts[1:])
+
+    def load_pieces(self, starts, ends):
+        curves = {}
+        for piece, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+            points = np.column_stack([self.xs[start:end], self.ys[start:end]]).astype(float)
+            # pieces are keyed by position, the stored curve id may repeat across the file
+            curves[piece] = list(map(tuple, points.tolist()))
+        return curves
+
+    def tiles(self):
+        """Yield (tile, shapes owned by the tile) in row-major order."""
+        if len(self.offsets) < 2:
+            return
+        _, starts, ends, bounds = stroke_pieces(self.offsets, self.xs, self.ys, self.tile_size + self.halo)
+
+        for tile, pieces in zip(*self.tile_pieces(bounds)):
+            core_min = tile * self.tile_size
+            core_max = core_min + self.tile_size
+
+            curves = self.load_pieces(starts[pieces], ends[pieces])
+            self.stats['max_tile_points'] = max(self.stats['max_tile_points'], int(np.sum(ends[pieces] - starts[pieces])))
+            result = Pipeline(**self.params).run(curves)
+            del curves
+
+            owned = []
+            for shape in result['shapes']:
+                anchor = np.asarray(shape_anchor(shape))
+                if np.all(anchor >= core_min) and np.all(anchor < core_max):
+                    owned.append(shape)
+            self.stats['tiles'] += 1
+            self.stats['shapes'] += len(owned)
+            yield tuple(int(v) for v in tile), owned
+
+    def write_csv(self, output):
+        writer = csv.writer(output)
+        writer.writerow(['CurveIndex', 'Static', 'X', 'Y'])
+        index = 0
+        for _, shapes in self.tiles():
+            for shape in shapes:
+                writer.writerows([index, '0.0000', x, y] for x, y in shape_to_points(shape))
+                index += 1
+
+    def write_ndjson(self, output):
+        for tile, shapes in self.tiles():
+            for shape in shapes:
+                output.write(json.dumps({'tile': tile, **shape}) + '\n')
+
+    def process(self, output_path):
+        with open(output_path, 'w', newline='') as output:
+            if output_path.endswith('.csv'):
+                self.write_csv(output)
+            else:
+                self.write_ndjson(output)
+        return self.stats
@@ -0,0 +1,94 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import uuid
+from datetime import datetime, timezone
+
+CAPTURE_SUFFIX = '.json.gz'
+
+
+def output_hash(output):
+    """SHA-256 of an exported result, before any content encoding."""
+    return hashlib.sha256(output.encode('utf-8') if isinstance(output, str) else output).hexdigest()
+
+
+class TrafficCapture:
+    """Sampled archive of processed uploads, for replaying slow or suspicious requests offline.
+
+    Disabled unless ``sample_rate`` is above zero. Each sampled request is
+    written to ``directory`` as one gzipped JSON record holding the raw
+    upload, the pipeline parameters, per-stage timings, which stages and
+    fits came from the caches, and a hash of the response body. Records are named by capture time, and the oldest are
+    deleted once the archive holds more than ``max_files`` records or
+    ``max_bytes`` bytes.
+    """
+
+    def __init__(self, directory, sample_rate=0.0, max_bytes=256 * 2 ** 20, max_files=1000, seed=None):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self):
+        if self.sample_rate <= 0:
+            return False
+        with self.lock:
+            return self.random.random() < self.sample_rate
+
+    def record(self, kind, filename, payload, output_format, params, export_options, timings, elapsed, output, cache=None):
+        captured_at = datetime.now(timezone.utc)
+        record = {
+            'captured_at': captured_at.isoformat(),
+            'kind': kind,
+            'filename': filename,
+            'payload': base64.b64encode(payload).decode('ascii'),
+            'output_format': output_format,
+            'params': params,
+            'export_options': export_options,
+            'timings': timings,
+            'elapsed': elapsed,
+            'cache': cache,
+            'output_sha256': output_hash(output),
+        }
+        name = captured_at.strftime('%Y%m%dT%H%M%S%fZ') + '-' + uuid.uuid4().hex[:8] + CAPTURE_SUFFIX
+        path = os.path.join(self.directory, name)
+
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            # written aside and renamed, so readers and rotation never see a partial record
+            with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+                json.dump(record, f)
+            os.replace(path + '.tmp', path)
+            self.rotate()
+        return path
+
+    def rotate(self):
+        paths = capture_paths(self.directory)
+        sizes = [os.path.getsize(path) for path in paths]
+        total = sum(sizes)
+        for path, size in zip(paths, sizes):
+            if len(paths) <= self.max_files and total <= self.max_bytes:
+                break
+            os.remove(path)
+            paths = paths[1:]
+            total -= size
+
+
+def capture_paths(directory):
+    """Capture records in ``directory``, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(CAPTURE_SUFFIX)]
+
+
+def read_capture(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        record = json.load(f)
+    record['payload'] = base64.b64decode(record['payload'])
+    return record
@@ -0,0 +1,18 @@
+import numpy as np
+from utils.conic_fitting import StrokeClassifier
+
+
+def test_evenly_sampled_straight_stroke_is_a_line():
+    # the direct ellipse fit of this stroke has a singular quadratic form that still passes 4ac - b^2 > 0
+    stroke = np.linspace([20.0, 120.0], [100.0, 130.0], 7)
+    (kind, (start, end)), = StrokeClassifier([stroke]).classify()
+    assert kind == 'line'
+    np.testing.assert_allclose([start, end], stroke[[0, -1]], atol=1e-6)
+
+
+def test_singular_stroke_does_not_fail_the_batch():
+    straight = np.linspace([20.0, 120.0], [100.0, 130.0], 7)
+    t = np.linspace(0, np.pi, 30)
+    arc = np.column_stack([100 + 40 * np.cos(t), 100 + 40 * np.sin(t)])
+    kinds = [kind for kind, _ in StrokeClassifier([straight, arc]).classify()]
+    assert kinds == ['line', 'arc']
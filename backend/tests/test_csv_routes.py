@@ -0,0 +1,30 @@
+import io
+import pytest
+from app import app
+from utils.point_codec import curves_to_columns, encode_frame
+
+CSV = b'0,0,10.0,10.0\n0,0,60.0,10.0\n0,0,60.0,40.0\n1,0,100.0,100.0\n1,0,150.0,120.0\n'
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def upload(client, name, payload, mimetype='application/octet-stream'):
+    return client.post('/upload_csv?format=json', data={'file': (io.BytesIO(payload), name, mimetype)})
+
+
+def test_csv_sent_as_octet_stream_is_parsed_as_csv(client):
+    assert upload(client, 'drawing.csv', CSV).status_code == 200
+
+
+def test_point_data_is_recognised_by_content(client):
+    frame = encode_frame(*curves_to_columns({0: [(10.0, 10.0), (60.0, 10.0)], 1: [(100.0, 100.0), (150.0, 120.0)]}))
+    assert upload(client, 'drawing.bin', frame).status_code == 200
+
+
+def test_unrecognised_point_data_is_a_client_error(client):
+    response = upload(client, 'drawing.crv', b'not a frame')
+    assert response.status_code == 400
+    assert 'Unrecognised' in response.get_json()['error']
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from utils.curve_processing import CurveProcessor
+from utils.geometry import line_distances
+
+EPSILONS = [0.0, 0.5, 2.0, 5.0, 20.0]
+
+
+def recursive_rdp(points, epsilon):
+    """The recursive Ramer-Douglas-Peucker that the importance threshold replaced, kept as the reference."""
+    dmax = 0.0
+    index = 0
+    if len(points) > 2:
+        distances = line_distances(points[1:-1], points[0], points[-1])
+        index = int(np.argmax(distances)) + 1
+        dmax = distances[index - 1]
+    if dmax > epsilon:
+        first = recursive_rdp(points[:index + 1], epsilon)
+        second = recursive_rdp(points[index:], epsilon)
+        return first[:-1] + [i + index for i in second]
+    return [0, len(points) - 1]
+
+
+def random_stroke(rng):
+    n = int(rng.integers(1, 80))
+    if rng.random() < 0.5:
+        return np.cumsum(rng.normal(0, 4, size=(n, 2)), axis=0)
+    # integer steps give repeated points, collinear runs and tied distances
+    return np.cumsum(rng.integers(-2, 3, size=(n, 2)), axis=0).astype(float)
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_importance_threshold_matches_recursive_rdp(seed):
+    rng = np.random.default_rng(seed)
+    processor = CurveProcessor({})
+    for _ in range(10):
+        points = random_stroke(rng)
+        importance = processor.rdp_importance(points)
+        for epsilon in EPSILONS:
+            assert processor.rdp_indices(importance, epsilon) == recursive_rdp(points, epsilon)
+
+
+def test_importance_is_nested_across_epsilons():
+    points = np.cumsum(np.random.default_rng(0).normal(0, 4, size=(500, 2)), axis=0)
+    processor = CurveProcessor({})
+    importance = processor.rdp_importance(points)
+    kept = [set(processor.rdp_indices(importance, epsilon)) for epsilon in EPSILONS]
+    assert all(coarse <= fine for fine, coarse in zip(kept, kept[1:]))
+
+
+def dense_snap(curves, threshold):
+    """End point snapping over dense N x N distance masks, as before ``close_pairs``, kept as the reference."""
+    updated = {key: points[:] for key, points in curves.items()}
+    keys = list(curves)
+    starts = np.array([curves[key][0] for key in keys], dtype=float).reshape(-1, 2)
+    ends = np.array([curves[key][-1] for key in keys], dtype=float).reshape(-1, 2)
+    midpoint = lambda p, q: ((p[0] + q[0]) / 2, (p[1] + q[1]) / 2)
+
+    for i in np.flatnonzero(np.linalg.norm(starts - ends, axis=1) < threshold):
+        key = keys[i]
+        updated[key][0] = updated[key][-1] = midpoint(curves[key][0], curves[key][-1])
+
+    pairings = [(0, 0), (0, -1), (-1, 0), (-1, -1)]
+    close = np.stack([np.linalg.norm((starts if a == 0 else ends)[:, None] - (starts if b == 0 else ends)[None], axis=-1) < threshold
+                      for a, b in pairings], axis=-1)
+    key_array = np.array(keys)
+    close &= (key_array[:, None] < key_array[None, :])[:, :, None]
+    for i, j, pairing in np.argwhere(close):
+        a, b = pairings[pairing]
+        updated[keys[i]][a] = updated[keys[j]][b] = midpoint(curves[keys[i]][a], curves[keys[j]][b])
+    return {key: [(round(x, 1), round(y, 1)) for x, y in points] for key, points in updated.items()}
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_endpoint_snapping_matches_dense_masks(seed):
+    rng = np.random.default_rng(seed)
+    keys = rng.permutation(60)[:int(rng.integers(1, 40))]
+    # lattice end points so that several ends meet, and some sit exactly at the threshold
+    curves = {int(key): [tuple(point) for point in (rng.integers(0, 20, size=(int(rng.integers(1, 5)), 2)) * 2.5).tolist()]
+              for key in keys}
+    processor = CurveProcessor(curves, threshold=5.0)
+    processor.simplified_curves = curves
+    processor.update_endpoints_with_midpoints()
+    assert processor.updated_curves == dense_snap(curves, 5.0)
@@ -0,0 +1,54 @@
+from collections import defaultdict
+import numpy as np
+import pytest
+from utils.cycle_detection import CycleDetector
+
+
+def exhaustive_cycles(graph):
+    """The DFS from every vertex that ``find_cycles`` replaced, kept as the reference."""
+    def dfs(node, start, visited, path):
+        visited[node] = True
+        path.append(node)
+        for neighbor in graph[node]:
+            if neighbor == start and len(path) > 2:
+                cycles.append(path[:] + [start])
+            elif not visited[neighbor]:
+                dfs(neighbor, start, visited, path)
+        path.pop()
+        visited[node] = False
+
+    cycles = []
+    visited = defaultdict(bool)
+    for node in graph:
+        if not visited[node]:
+            dfs(node, node, visited, [])
+
+    unique_cycles = []
+    for cycle in cycles:
+        if all(set(cycle) != set(c) for c in unique_cycles):
+            unique_cycles.append(cycle)
+    return unique_cycles
+
+
+def random_strokes(rng, n_strokes, grid):
+    """Short strokes on a coarse grid, so they share vertices, cross and retrace each other."""
+    curves = {}
+    for i in range(n_strokes):
+        points = rng.integers(0, grid, size=(int(rng.integers(2, 7)), 2)).astype(float)
+        curves[i] = [tuple(point) for point in points.tolist()]
+    return curves
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_find_cycles_matches_exhaustive_search(seed):
+    rng = np.random.default_rng(seed)
+    detector = CycleDetector(random_strokes(rng, int(rng.integers(1, 5)), grid=4))
+    assert detector.find_cycles(detector.adj_list) == exhaustive_cycles(detector.adj_list)
+
+
+def test_find_cycles_expands_contracted_chains():
+    square = [(0.0, 0.0), (1.0, 0.0), (2.0, 0.0), (2.0, 1.0), (2.0, 2.0), (1.0, 2.0), (0.0, 2.0), (0.0, 1.0), (0.0, 0.0)]
+    detector = CycleDetector({0: square, 1: [(1.0, 0.0), (1.0, 2.0)], 2: [(5.0, 5.0), (6.0, 5.0)]})
+    cycles = detector.find_cycles(detector.adj_list)
+    assert cycles == exhaustive_cycles(detector.adj_list)
+    assert sorted(len(cycle) for cycle in cycles) == [6, 6, 9]
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+from utils.geometry import close_pairs
+
+
+def brute_force_pairs(points, tolerance):
+    distances = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=-1)
+    return np.argwhere(np.triu(distances < tolerance, 1))
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('tolerance', [0.5, 1.0, 3.0])
+def test_close_pairs_matches_brute_force(seed, tolerance):
+    rng = np.random.default_rng(seed)
+    # lattice points repeat and sit exactly at the tolerance from each other, which must not count
+    points = rng.integers(0, 12, size=(int(rng.integers(0, 120)), 2)).astype(float)
+    np.testing.assert_array_equal(close_pairs(points, tolerance), brute_force_pairs(points, tolerance).reshape(-1, 2))
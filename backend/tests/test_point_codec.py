@@ -0,0 +1,64 @@
+import bz2
+import gzip
+import io
+import lzma
+import zlib
+import numpy as np
+import pytest
+from services.csv_service import parse_binary, process_binary_data
+from utils.point_codec import (InvalidPointData, PayloadTooLarge, columns_to_curves, curves_to_columns, decode_points,
+                               decompress, encode_frame)
+
+CURVES = {
+    0: [(10.0, 10.0), (60.0, 10.0), (60.0, 40.0)],
+    3: [(100.25, 100.5), (150.0, 120.0)],
+    7: [(-5.0, 2.5)],
+}
+COMPRESSORS = [lambda data: data, gzip.compress, bz2.compress, lzma.compress, zlib.compress]
+
+
+def npy_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('compress', COMPRESSORS)
+@pytest.mark.parametrize('dtype', ['float32', 'float64'])
+def test_frame_round_trip(compress, dtype):
+    payload = compress(encode_frame(*curves_to_columns(CURVES), dtype=dtype))
+    assert columns_to_curves(*decode_points(payload)) == CURVES
+
+
+@pytest.mark.parametrize('compress', COMPRESSORS)
+def test_npy_round_trip(compress):
+    rows = [(curve_id, 0.0, x, y) for curve_id, points in CURVES.items() for x, y in points]
+    assert columns_to_curves(*decode_points(compress(npy_bytes(np.array(rows))))) == CURVES
+    assert columns_to_curves(*decode_points(compress(npy_bytes(np.array(rows)[:, [0, 2, 3]])))) == CURVES
+
+
+def test_random_frames_round_trip():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        curves = {int(curve_id): list(map(tuple, rng.uniform(-1e3, 1e3, (int(rng.integers(1, 20)), 2)).tolist()))
+                  for curve_id in rng.choice(1000, int(rng.integers(1, 10)), replace=False)}
+        assert columns_to_curves(*decode_points(encode_frame(*curves_to_columns(curves)))) == curves
+
+
+def test_empty_curves_are_dropped():
+    frame = encode_frame([0, 1, 2], [0, 2, 2, 4], [0.0, 50.0, 100.0, 150.0], [0.0, 0.0, 100.0, 120.0])
+    assert list(parse_binary(frame)) == [0, 2]
+    output, _ = process_binary_data(frame, 'json')
+    assert output
+
+
+def test_malformed_frames_are_rejected():
+    frame = encode_frame(*curves_to_columns(CURVES))
+    for payload in [b'not points', frame[:10], frame[:-8]]:
+        with pytest.raises(InvalidPointData):
+            decode_points(payload)
+
+
+def test_decompression_is_capped():
+    with pytest.raises(PayloadTooLarge):
+        decompress(gzip.compress(b'0' * 10 ** 6), max_size=10 ** 5)
@@ -0,0 +1,13 @@
+import numpy as np
+import pytest
+from utils.segment_processing import shares_end_point
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_shares_end_point_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    segments = [tuple(map(tuple, segment)) for segment in rng.integers(0, 10, size=(int(rng.integers(0, 60)), 2, 2)).tolist()]
+    expected = [{j for j, other in enumerate(segments) if j != i
+                 and any(np.hypot(p[0] - q[0], p[1] - q[1]) < 2 for p in segment for q in other)}
+                for i, segment in enumerate(segments)]
+    assert shares_end_point(segments, 2) == expected
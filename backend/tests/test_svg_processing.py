@@ -0,0 +1,15 @@
+import numpy as np
+from services.csv_service import parse_svg
+
+SVG = '''<svg xmlns="http://www.w3.org/2000/svg" width="200" height="200">
+<g transform="translate(100,50)">
+<path d="M0 0 L10 0 L10 20" transform="scale(2)"/>
+</g>
+<path d="M0 0 L30 40" transform="translate(5,5)"/>
+</svg>'''
+
+
+def test_group_and_element_transforms_are_applied():
+    grouped, single = sorted(parse_svg(SVG).values(), key=len, reverse=True)
+    np.testing.assert_allclose(grouped, [(100, 50), (120, 50), (120, 90)])
+    np.testing.assert_allclose(single, [(5, 5), (35, 45)])
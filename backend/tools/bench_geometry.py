@@ -0,0 +1,97 @@
+"""Micro-benchmark the geometry kernels against the per-point loops or dense masks they replaced.
+
+Run from the backend directory:
+
+    python -m tools.bench_geometry --sizes 100 1000 --repeat 5
+"""
+import argparse
+import math
+import timeit
+import numpy as np
+from utils import geometry
+
+def scalar_segment_distance(p, v, w):
+    l2 = np.sum((v - w) ** 2)
+    if l2 == 0:
+        return np.linalg.norm(p - v)
+    t = max(0, min(1, np.dot(p - v, w - v) / l2))
+    return np.linalg.norm(p - (v + t * (w - v)))
+
+def scalar_line_distance(point, start, end):
+    n = abs((end[1] - start[1]) * point[0] - (end[0] - start[0]) * point[1] + end[0] * start[1] - end[1] * start[0])
+    return n / np.linalg.norm(end - start)
+
+def scalar_turning_angle(p1, p2, p3):
+    vec1, vec2 = p2 - p1, p3 - p2
+    cos_theta = np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+    return math.degrees(math.acos(min(1, max(-1, cos_theta))))
+
+def scalar_triangle_area(p1, p2, p3):
+    return 0.5 * abs(p1[0] * (p2[1] - p3[1]) + p2[0] * (p3[1] - p1[1]) + p3[0] * (p1[1] - p2[1]))
+
+def scalar_slope(p1, p2):
+    return np.inf if p2[0] == p1[0] else (p2[1] - p1[1]) / (p2[0] - p1[0])
+
+def cases(n, rng):
+    """(name, kernel call, equivalent scalar loop or None) for inputs of about ``n`` points."""
+    points = rng.uniform(0, 500, size=(n, 2))
+    others = rng.uniform(0, 500, size=(n, 2))
+    m = max(n // 10, 3)
+    starts, ends = rng.uniform(0, 500, size=(m, 2)), rng.uniform(0, 500, size=(m, 2))
+    previous, following = np.roll(points, 1, axis=0), np.roll(points, -1, axis=0)
+    candidates = geometry.regular_polygons(points.mean(axis=0), [50.0], 6, np.linspace(0, 2 * np.pi, 360))[0]
+
+    return [
+        ('point_distances', lambda: geometry.point_distances(points, others[:m]),
+         lambda: [[np.linalg.norm(p - q) for q in others[:m]] for p in points]),
+        ('close_pairs', lambda: geometry.close_pairs(points, 5.0),
+         lambda: np.argwhere(np.triu(geometry.point_distances(points, points) < 5.0, 1))),
+        ('segment_distances', lambda: geometry.segment_distances(points, starts, ends),
+         lambda: [[scalar_segment_distance(p, v, w) for v, w in zip(starts, ends)] for p in points]),
+        ('segment_distances batched polygons', lambda: geometry.segment_distances(points[:30], *geometry.closed_edges(candidates)),
+         None),
+        ('line_distances', lambda: geometry.line_distances(points, starts[0], ends[0]),
+         lambda: [scalar_line_distance(p, starts[0], ends[0]) for p in points]),
+        ('turning_angles', lambda: geometry.turning_angles(previous, points, following),
+         lambda: [scalar_turning_angle(a, b, c) for a, b, c in zip(previous, points, following)]),
+        ('triangle_areas', lambda: geometry.triangle_areas(previous, points, following),
+         lambda: [scalar_triangle_area(a, b, c) for a, b, c in zip(previous, points, following)]),
+        ('slopes', lambda: geometry.slopes(points, others),
+         lambda: [scalar_slope(a, b) for a, b in zip(points, others)]),
+        ('sample_segments', lambda: geometry.sample_segments(points, others),
+         lambda: [np.linspace(a, b, 30) for a, b in zip(points, others)]),
+        ('edge_lengths', lambda: geometry.edge_lengths(points),
+         lambda: [np.linalg.norm(points[(i + 1) % n] - points[i]) for i in range(n)]),
+        ('arc_lengths', lambda: geometry.arc_lengths(points), None),
+        ('unit_vectors', lambda: geometry.unit_vectors(points - others), None),
+        ('circle_distances', lambda: geometry.circle_distances(points, np.array([250.0, 250.0]), 100.0), None),
+        ('circumcircles', lambda: geometry.circumcircles(previous, points, following), None),
+        ('regular_polygons', lambda: geometry.regular_polygons([0.0, 0.0], np.linspace(49, 51, 5), 6, np.linspace(0, 2 * np.pi, n)),
+         None),
+    ]
+
+def best_time(fn, repeat):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-scalar', action='store_true', help='time only the kernels')
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    print(f"{'kernel':<36}{'n':>7}{'kernel us':>12}{'scalar us':>12}{'speedup':>9}")
+    for n in args.sizes:
+        for name, kernel, scalar in cases(n, rng):
+            kernel_time = best_time(kernel, args.repeat)
+            if scalar is None or args.skip_scalar:
+                print(f'{name:<36}{n:>7}{kernel_time * 1e6:>12.1f}{"-":>12}{"-":>9}')
+                continue
+            scalar_time = best_time(scalar, args.repeat)
+            print(f'{name:<36}{n:>7}{kernel_time * 1e6:>12.1f}{scalar_time * 1e6:>12.1f}{scalar_time / kernel_time:>8.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Load-test /upload_csv against a local waitress server and report throughput, tail latency and memory.
+
+Run from the backend directory:
+
+    python -m tools.load_test --threads 4 --concurrency 8 --duration 30
+    python -m tools.load_test --threads 8 --concurrency 32 --rate 10 --synthetic 20 --output report.json
+
+The server runs ``create_app`` under waitress in a child process so its RSS
+can be sampled on its own. Requests replay the sample drawings plus seeded
+synthetic ones; with ``--rate`` they arrive as a Poisson process and latency
+is measured from the scheduled arrival, so queueing behind a saturated
+server is counted instead of hidden. Every request moves each point by
+seeded Gaussian noise of ``--jitter`` pixels, so the server's stage and fit
+caches miss as they would on fresh drawings instead of serving every
+request after the first round; the report includes the server's
+``/cache_stats`` to confirm it. ``--jitter 0`` measures the cached path.
+"""
+import argparse
+import glob
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import numpy as np
+import psutil
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'problems')
+
+def serve(port, threads):
+    from waitress import serve as waitress_serve
+    from configApp import create_app
+    # queue depth warnings are expected under deliberate overload and would drown the report
+    logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+    waitress_serve(create_app(), host='127.0.0.1', port=port, threads=threads, _quiet=True)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_until_up(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server did not start on port {port}')
+
+def synthetic_drawing(rng, n_shapes=8, noise=1.0):
+    """A hand-drawn-looking CSV of circles, regular polygons and open strokes."""
+    rows = ['CurveIndex,Static,X,Y']
+    for curve in range(n_shapes):
+        center = rng.uniform(50, 450, size=2)
+        radius = rng.uniform(15, 60)
+        kind = rng.integers(3)
+        if kind == 0:
+            t = np.linspace(0, 2 * np.pi, 60)
+            points = center + radius * np.column_stack([np.cos(t), np.sin(t)])
+        elif kind == 1:
+            sides = rng.integers(3, 8)
+            angles = np.linspace(0, 2 * np.pi, sides + 1) + rng.uniform(0, np.pi)
+            corners = center + radius * np.column_stack([np.cos(angles), np.sin(angles)])
+            points = np.concatenate([np.linspace(a, b, 12, endpoint=False) for a, b in zip(corners[:-1], corners[1:])] + [corners[:1]])
+        else:
+            end = center + rng.uniform(-2, 2, size=2) * radius
+            points = np.linspace(center, end, 30)
+        points = points + rng.normal(0, noise, size=points.shape)
+        rows += [f'{curve},0.0000,{x:.3f},{y:.3f}' for x, y in points]
+    return '\n'.join(rows) + '\n'
+
+def load_payloads(data_dir, n_synthetic, seed):
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(data_dir, '*.csv'))):
+        with open(path, 'rb') as f:
+            payloads.append((os.path.basename(path), f.read()))
+    rng = np.random.default_rng(seed)
+    for i in range(n_synthetic):
+        payloads.append((f'synthetic{i}.csv', synthetic_drawing(rng, n_shapes=int(rng.integers(3, 15))).encode()))
+    return payloads
+
+def multipart_body(filename, data):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+def read_rows(data):
+    """(N, 4) CurveIndex, Static, X, Y rows of a CSV drawing, header or not."""
+    rows = np.genfromtxt(BytesIO(data), delimiter=',', ndmin=2)
+    return rows[~np.isnan(rows).any(axis=1)]
+
+def jittered_csv(rows, rng, jitter):
+    rows = rows.copy()
+    rows[:, 2:] += rng.normal(0, jitter, size=(len(rows), 2))
+    output = BytesIO()
+    np.savetxt(output, rows, fmt=['%d', '%.4f', '%.3f', '%.3f'], delimiter=',')
+    return output.getvalue()
+
+class LoadRunner:
+    def __init__(self, port, payloads, concurrency, rate=None, duration=30.0, output_format='csv', seed=0, jitter=0.5):
+        self.port = port
+        self.jitter = jitter
+        self.payloads = [(name, data, read_rows(data) if jitter > 0 else None) for name, data in payloads]
+        self.seed = seed
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.path = f'/upload_csv?format={output_format}'
+        self.rng = np.random.default_rng(seed)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.samples = []
+
+    def connection(self):
+        if not hasattr(self.local, 'connection'):
+            self.local.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        return self.local.connection
+
+    def request_body(self, i):
+        name, data, rows = self.payloads[i % len(self.payloads)]
+        if self.jitter > 0:
+            data = jittered_csv(rows, np.random.default_rng([self.seed, i]), self.jitter)
+        return multipart_body(name, data)
+
+    def send(self, i, scheduled):
+        body, content_type = self.request_body(i)
+        status = None
+        try:
+            connection = self.connection()
+            connection.request('POST', self.path, body=body, headers={'Content-Type': content_type})
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            # drop the connection so the next request on this worker reconnects
+            del self.local.connection
+        finished = time.monotonic()
+        with self.lock:
+            self.samples.append((finished, finished - scheduled, status))
+
+    def closed_loop(self, worker, deadline):
+        i = worker
+        while time.monotonic() < deadline:
+            self.send(i, time.monotonic())
+            i += self.concurrency
+
+    def run(self):
+        start = time.monotonic()
+        deadline = start + self.duration
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            if self.rate:
+                scheduled, i = start, 0
+                while True:
+                    scheduled += self.rng.exponential(1 / self.rate)
+                    if scheduled >= deadline:
+                        break
+                    time.sleep(max(scheduled - time.monotonic(), 0))
+                    pool.submit(self.send, i, scheduled)
+                    i += 1
+            else:
+                for worker in range(self.concurrency):
+                    pool.submit(self.closed_loop, worker, deadline)
+        return start, time.monotonic()
+
+def cache_stats(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.request('GET', '/cache_stats')
+    return json.loads(connection.getresponse().read())
+
+def sample_rss(pid, interval, stop, timeline):
+    process = psutil.Process(pid)
+    start = time.monotonic()
+    while not stop.wait(interval):
+        memory = sum(p.memory_info().rss for p in [process] + process.children(recursive=True))
+        timeline.append((time.monotonic() - start, memory))
+
+def summarize(samples, start, end, rss_timeline):
+    latencies = np.array([latency for _, latency, _ in samples])
+    errors = sum(1 for _, _, status in samples if status != 200)
+    elapsed = end - start
+    report = {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': errors / len(samples) if samples else 0.0,
+        'requests_per_second': len(samples) / elapsed if elapsed > 0 else 0.0,
+        'duration': elapsed,
+    }
+    if len(latencies):
+        for q in (50, 95, 99):
+            report[f'p{q}_ms'] = float(np.percentile(latencies, q) * 1000)
+        report['max_ms'] = float(latencies.max() * 1000)
+    report['rss_mb'] = [[round(t, 2), round(rss / 2 ** 20, 1)] for t, rss in rss_timeline]
+    report['peak_rss_mb'] = max((rss for _, rss in report['rss_mb']), default=None)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=4, help='waitress worker threads')
+    parser.add_argument('--concurrency', type=int, default=8, help='client connections')
+    parser.add_argument('--rate', type=float, help='mean arrivals per second; closed loop when omitted')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to generate load for')
+    parser.add_argument('--data', default=DEFAULT_DATA_DIR, help='directory of CSV drawings to replay')
+    parser.add_argument('--synthetic', type=int, default=10, help='number of synthetic drawings to add')
+    parser.add_argument('--format', default='csv', help='response format to request')
+    parser.add_argument('--rss-interval', type=float, default=0.5, help='seconds between server RSS samples')
+    parser.add_argument('--port', type=int, help='defaults to a free port')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jitter', type=float, default=0.5,
+                        help='pixels of per-request noise added to every point, 0 replays the drawings unchanged')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    payloads = load_payloads(args.data, args.synthetic, args.seed)
+    if not payloads:
+        parser.error(f'no CSV files found in {args.data} and no synthetic drawings requested')
+
+    port = args.port or free_port()
+    server = multiprocessing.Process(target=serve, args=(port, args.threads), daemon=True)
+    server.start()
+    try:
+        wait_until_up(port)
+        stop, timeline = threading.Event(), []
+        sampler = threading.Thread(target=sample_rss, args=(server.pid, args.rss_interval, stop, timeline), daemon=True)
+        sampler.start()
+
+        runner = LoadRunner(port, payloads, args.concurrency, args.rate, args.duration, args.format, args.seed, args.jitter)
+        start, end = runner.run()
+        stop.set()
+        sampler.join()
+        caches = cache_stats(port)
+    finally:
+        server.terminate()
+        server.join()
+
+    report = {'threads': args.threads, 'concurrency': args.concurrency, 'rate': args.rate, 'jitter': args.jitter,
+              **summarize(runner.samples, start, end, timeline), 'cache_stats': caches}
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        json.dump(report, output, indent=2)
+        output.write('\n')
+    finally:
+        if args.output:
+            output.close()
+
+    print(f"{report['requests']} requests at {report['requests_per_second']:.1f}/s, "
+          f"p50 {report.get('p50_ms', 0):.0f} ms, p95 {report.get('p95_ms', 0):.0f} ms, p99 {report.get('p99_ms', 0):.0f} ms, "
+          f"{report['error_rate']:.1%} errors, peak RSS {report['peak_rss_mb']} MB, "
+          f"stage cache hit rate {caches['stages']['hit_rate']:.1%}, fit cache hit rate {caches['fits']['hit_rate']:.1%}",
+          file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Regularize a very large drawing tile by tile, streaming shapes to disk.
+
+Run from the backend directory:
+
+    python -m tools.process_tiled drawing.crv shapes.csv --tile-size 512 --halo 128
+    python -m tools.process_tiled drawing.csv drawing.crv --convert
+
+Input is an uncompressed curve frame (.crv) or an .npy point array, which are
+memory-mapped; CSV output uses the upload format, any other extension NDJSON.
+"""
+import argparse
+import sys
+from services.csv_service import parse_csv
+from services.tiled_service import TiledProcessor
+from utils.point_codec import curves_to_columns, encode_frame
+
+def convert(csv_path, frame_path, dtype):
+    with open(csv_path) as f:
+        curves = parse_csv(f.read())
+    with open(frame_path, 'wb') as f:
+        f.write(encode_frame(*curves_to_columns(curves), dtype=dtype))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--tile-size', type=float, default=512.0)
+    parser.add_argument('--halo', type=float, default=128.0)
+    parser.add_argument('--epsilon', type=float, default=5.0)
+    parser.add_argument('--convert', action='store_true', help='convert a CSV drawing into a curve frame and exit')
+    parser.add_argument('--dtype', choices=['float32', 'float64'], default='float64')
+    args = parser.parse_args(argv)
+
+    if args.convert:
+        convert(args.input, args.output, args.dtype)
+        return
+
+    processor = TiledProcessor(args.input, tile_size=args.tile_size, halo=args.halo, epsilon=args.epsilon)
+    stats = processor.process(args.output)
+    print(f"{stats['shapes']} shapes from {stats['tiles']} tiles, "
+          f"largest tile held {stats['max_tile_points']} points", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
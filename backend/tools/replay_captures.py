@@ -0,0 +1,114 @@
+"""Replay captured /upload_csv requests offline and compare outputs and timings with the recording.
+
+Run from the backend directory:
+
+    python -m tools.replay_captures captures
+    python -m tools.replay_captures captures/20260101T120000000000Z-1a2b3c4d.json.gz --repeat 3 --output replay.csv
+
+Captures are written by the server when ``CAPTURE_SAMPLE_RATE`` is set.
+Every capture is run through the same cached ``process_*_data`` path as
+the request, with the stage and fit caches emptied before each run so the
+replay never depends on earlier traffic. The best of ``--repeat`` runs is
+compared with the recorded per-stage timings, next to which stages the
+recorded request found in the stage cache and how many fits it reused from
+earlier requests. The response hash is checked against the recorded one,
+and exits with status 1 when any output differs for a request that reused
+nothing, since cached fits are rescaled and need not match to the last bit.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from services.csv_service import process_upload, stage_cache, fit_cache
+from services.traffic_capture import capture_paths, output_hash, read_capture
+
+def replay(record, repeat):
+    """Best elapsed time, its per-stage timings and whether every run reproduced the recorded output."""
+    best = None
+    matches = True
+    for _ in range(repeat):
+        stage_cache.clear()
+        fit_cache.clear()
+        timings = {}
+        start = time.perf_counter()
+        result, _ = process_upload(record['kind'], record['payload'], record['output_format'], record['params'], timings,
+                                   **record['export_options'])
+        elapsed = time.perf_counter() - start
+        matches &= output_hash(result) == record['output_sha256']
+        if best is None or elapsed < best[0]:
+            best = (elapsed, timings)
+    return best[0], best[1], matches
+
+def reused_cache(record):
+    """Whether the recorded request took any stage or fit from earlier traffic; older records ran uncached."""
+    cache = record.get('cache') or {}
+    return any(cache.get('stages', {}).values()) or cache.get('reused_fits', 0) > 0
+
+def compare(name, record, elapsed, timings, matches):
+    cache = record.get('cache') or {}
+    row = {
+        'capture': name,
+        'filename': record['filename'],
+        'format': record['output_format'],
+        'match': matches,
+        'reused_cache': reused_cache(record),
+        'cached_stages': ' '.join(stage for stage, hit in cache.get('stages', {}).items() if hit),
+        'reused_fits': cache.get('reused_fits', 0),
+        'recorded_ms': round(record['elapsed'] * 1000, 3),
+        'replay_ms': round(elapsed * 1000, 3),
+        'ratio': round(elapsed / record['elapsed'], 3) if record['elapsed'] > 0 else 0.0,
+    }
+    for stage in list(record['timings']) + [stage for stage in timings if stage not in record['timings']]:
+        row[f'{stage}_recorded_ms'] = round(record['timings'].get(stage, 0.0) * 1000, 3)
+        row[f'{stage}_replay_ms'] = round(timings.get(stage, 0.0) * 1000, 3)
+    return row
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('captures', nargs='+', help='capture records or directories of them')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per capture, the fastest is reported')
+    parser.add_argument('--output', help='write one CSV row per capture here instead of stdout')
+    args = parser.parse_args(argv)
+
+    paths = []
+    for path in args.captures:
+        paths += capture_paths(path) if os.path.isdir(path) else [path]
+    if not paths:
+        parser.error('no captures found')
+
+    rows = []
+    for path in paths:
+        record = read_capture(path)
+        try:
+            elapsed, timings, matches = replay(record, args.repeat)
+        except Exception as e:
+            rows.append({'capture': os.path.basename(path), 'filename': record['filename'], 'match': False,
+                         'reused_cache': False, 'error': str(e)})
+            continue
+        rows.append(compare(os.path.basename(path), record, elapsed, timings, matches))
+
+    columns = []
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames=columns, restval='')
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if args.output:
+            output.close()
+
+    mismatches = sum(1 for row in rows if not row['match'] and not row['reused_cache'])
+    warm = sum(1 for row in rows if row['reused_cache'])
+    replayed = [row for row in rows if 'ratio' in row]
+    recorded = sum(row['recorded_ms'] for row in replayed)
+    speedup = recorded / sum(row['replay_ms'] for row in replayed) if replayed else 0.0
+    print(f'{len(rows)} captures ({warm} recorded with cache hits), {mismatches} output mismatches, '
+          f'replay {speedup:.2f}x the recorded speed overall', file=sys.stderr)
+    return 1 if mismatches else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Evaluate a parameter grid over the sample drawings, reusing cached pipeline stages.
+
+Run from the backend directory:
+
+    python -m tools.sweep --epsilon 3 5 8 --mse-threshold 30 50 80 --output sweep.csv
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+from services.csv_service import parse_csv
+from services.pipeline import DEFAULT_PARAMS, FitCache, StageCache, sweep
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'problems')
+
+def load_inputs(data_dir):
+    inputs = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, '*.csv'))):
+        with open(path) as f:
+            inputs[os.path.basename(path)] = parse_csv(f.read())
+    return inputs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default=DEFAULT_DATA_DIR, help='directory of CSV drawings')
+    parser.add_argument('--output', help='write one CSV row per run here instead of stdout')
+    parser.add_argument('--fit-cache', action='store_true', help='share circle and polygon fits between repeated shapes')
+    for name, default in DEFAULT_PARAMS.items():
+        parser.add_argument('--' + name.replace('_', '-'), dest=name, nargs='+', type=type(default), default=[default])
+    args = parser.parse_args(argv)
+
+    inputs = load_inputs(args.data)
+    if not inputs:
+        parser.error(f'no CSV files found in {args.data}')
+
+    grid = {name: getattr(args, name) for name in DEFAULT_PARAMS}
+    fit_cache = FitCache() if args.fit_cache else None
+    rows, cache_stats = sweep(inputs, grid, StageCache(max_entries=4096), fit_cache)
+
+    columns = []
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        writer = csv.DictWriter(output, fieldnames=columns, restval=0)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if args.output:
+            output.close()
+
+    print(f"{len(rows)} runs, stage cache hit rate {cache_stats['hit_rate']:.1%} "
+          f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)", file=sys.stderr)
+    if fit_cache is not None:
+        fit_stats = fit_cache.stats()
+        print(f"fit cache hit rate {fit_stats['hit_rate']:.1%} ({fit_stats['hits']} hits, {fit_stats['misses']} misses)",
+              file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -1,81 +1,45 @@
-import math
-import heapq
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.spatial.distance import cdist
+from utils.geometry import circle_distances, circumcircles, closed_edges, sample_segments
 
 
-class CircleDetector:
-    def __init__(self, unique_cycles):
-        self.unique_cycles = unique_cycles
-        self.remaining_sides = set()
-        self.marked_sides = set()
-
-    def point_to_segment_dist(self, p, v, w):
-        l2 = np.sum((v - w) ** 2)
-        if l2 == 0:
-            return np.sum((p - v) ** 2)
-        t = max(0, min(1, np.dot(p - v, w - v) / l2))
-        projection = v + t * (w - v)
-        return np.sum((p - projection) ** 2)
-
-    def mean_square_circle_error(self, polygon, center, radius, num_points=20):
-        total_error = 0
-        total_samples = 0
-
-        for i in range(len(polygon)):
-            p1 = polygon[i]
-            p2 = polygon[(i + 1) % len(polygon)]
+def side_key(p1, p2):
+    return tuple(sorted([tuple(p1), tuple(p2)]))
 
-            segment_points = np.linspace(p1, p2, num_points)
 
-            for point in segment_points:
-                closest_point = self.closest_point_on_circle(point, center, radius)
-                dist = np.linalg.norm(point - closest_point)
-                error = dist ** 2
-                total_error += error
+def cycle_sides(polygon):
+    return [side_key(polygon[i], polygon[(i + 1) % len(polygon)]) for i in range(len(polygon))]
 
-            total_samples += len(segment_points)
 
-        mse = total_error / total_samples
-        return mse
+class CircleDetector:
+    def __init__(self, unique_cycles, mse_threshold=50, seed=None):
+        self.unique_cycles = unique_cycles
+        self.mse_threshold = mse_threshold
+        self.rng = np.random.default_rng(seed)
+        self.remaining_sides = []
+        self.marked_sides = set()
 
-    def closest_point_on_circle(self, point, center, radius):
-        direction = point - center
-        direction /= np.linalg.norm(direction)
-        return center + direction * radius
+    def mean_square_circle_error(self, polygon, centers, radii, num_points=20):
+        """Mean squared distance from points sampled along the polygon's edges to each circle."""
+        samples = sample_segments(*closed_edges(np.asarray(polygon, dtype=float)), num_points).reshape(-1, 2)
+        centers = np.asarray(centers, dtype=float)
+        errors = circle_distances(samples, centers[..., None, :], np.asarray(radii)[..., None]) ** 2
+        return errors.mean(axis=-1)
 
-    def best_fit_circle(self, polygon):
+    def best_fit_circle(self, polygon, rng=None):
         polygon = np.array(polygon)
+        rng = self.rng if rng is None else rng
 
-        best_mse = float('inf')
-        best_center = None
-        best_radius = None
-
-        for _ in range(20): 
-            sample_indices = np.random.choice(len(polygon), 3, replace=False)
-            sample_points = polygon[sample_indices]
-
-            A = sample_points[0]
-            B = sample_points[1]
-            C = sample_points[2]
+        # circles through 20 random vertex triples, scored together
+        samples = np.array([polygon[rng.choice(len(polygon), 3, replace=False)] for _ in range(20)])
+        centers, radii = circumcircles(samples[:, 0], samples[:, 1], samples[:, 2])
+        mse = self.mean_square_circle_error(polygon, centers, radii)
+        mse = np.where(np.isnan(mse), np.inf, mse)
 
-            D = 2 * (A[0] * (B[1] - C[1]) + B[0] * (C[1] - A[1]) + C[0] * (A[1] - B[1]))
-            if D == 0:
-                continue
-
-            Ux = ((A[0]**2 + A[1]**2) * (B[1] - C[1]) + (B[0]**2 + B[1]**2) * (C[1] - A[1]) + (C[0]**2 + C[1]**2) * (A[1] - B[1])) / D
-            Uy = ((A[0]**2 + A[1]**2) * (C[0] - B[0]) + (B[0]**2 + B[1]**2) * (A[0] - C[0]) + (C[0]**2 + C[1]**2) * (B[0] - A[0])) / D
-            center = np.array([Ux, Uy])
-            radius = np.linalg.norm(center - A)
-
-            mse = self.mean_square_circle_error(polygon, center, radius)
-            if mse < best_mse:
-                best_mse = mse
-                best_center = center
-                best_radius = radius
-
-        return best_center, best_radius, best_mse
+        best = int(np.argmin(mse))
+        if not np.isfinite(mse[best]):
+            return None, None, float('inf')
+        return centers[best], radii[best], mse[best]
 
     def plot_polygon_and_circle(self, polygon, center, radius, label):
         polygon = np.array(polygon)  # Ensure polygon is a numpy array
@@ -89,81 +53,52 @@ class CircleDetector:
     def plot_remaining_sides(self, unique_cycles, marked_sides):
         for polygon in unique_cycles:
             polygon = np.array(polygon)
-            for i in range(len(polygon)):
-                side = tuple(sorted([tuple(polygon[i]), tuple(polygon[(i + 1) % len(polygon)])]))
+            for i, side in enumerate(cycle_sides(polygon)):
                 if side not in marked_sides:
-                    plt.plot(*np.array([polygon[i], polygon[(i + 1) % len(polygon)]]).T, 'k-', label='Remaining Side' if i == 0 else "")
-
-    def detect_circles(self):
-        min_heap = []
-        possible_circles = []
-        unused_loops = []
+                    plt.plot(*np.array(side).T, 'k-', label='Remaining Side' if i == 0 else "")
 
+    def index_edges(self):
+        """Give every distinct side an integer id and each cycle the array of its side ids."""
+        edge_ids = {}
+        self.cycle_edges = []
         for polygon in self.unique_cycles:
-            center, radius, mse = self.best_fit_circle(polygon)
-            heapq.heappush(min_heap, (mse, center, radius, polygon))
-
-        while min_heap:
-            mse, center, radius, polygon = heapq.heappop(min_heap)
-
-            contains_marked_side = False
-            for i in range(len(polygon)):
-                side = tuple(sorted([tuple(polygon[i]), tuple(polygon[(i + 1) % len(polygon)])]))
-                if side in self.marked_sides:
-                    contains_marked_side = True
-                    break
-
-            if contains_marked_side:
-                unused_loops.append(polygon)
-                continue
-
-            # self.plot_polygon_and_circle(polygon, center, radius, label='Best Fit Circle')
-            # self.plot_remaining_sides(self.unique_cycles, self.marked_sides)
-            # plt.legend()
-            # plt.axis('equal')
-            # plt.show()
-            # print(mse)
-            if mse < 50:
-                # print(f'Mean Square Fitting Error: {mse:.4f}')
-                possible_circles.append((center, radius, polygon))
-
-                for i in range(len(polygon)):
-                    side = tuple(sorted([tuple(polygon[i]), tuple(polygon[(i + 1) % len(polygon)])]))
-                    self.marked_sides.add(side)
+            ids = [edge_ids.setdefault(side, len(edge_ids)) for side in cycle_sides(polygon)]
+            self.cycle_edges.append(np.array(ids, dtype=np.intp))
+        self.edge_sides = [((float(x1), float(y1)), (float(x2), float(y2))) for ((x1, y1), (x2, y2)) in edge_ids]
+
+    def fit_circles(self):
+        return [self.best_fit_circle(polygon) for polygon in self.unique_cycles]
+
+    def detect_circles(self, fits=None):
+        """Greedily keep the best fitting cycles whose sides no kept circle has claimed yet.
+
+        Cycles are visited by ascending MSE, ties broken by their position in
+        ``unique_cycles``, and side ownership is a bitmap over edge ids, so the
+        selection is linear in the total cycle length after the sort.
+        ``remaining_sides`` ends up holding the sides that belong to neither a
+        kept circle nor a returned unused loop, in edge id order.
+        """
+        if fits is None:
+            fits = self.fit_circles()
+        self.index_edges()
+
+        claimed = np.zeros(len(self.edge_sides), dtype=bool)
+        possible_circles = []
+        unused = []
+        for i in sorted(range(len(self.unique_cycles)), key=lambda i: (fits[i][2], i)):
+            center, radius, mse = fits[i]
+            edges = self.cycle_edges[i]
+            if mse < self.mse_threshold and not claimed[edges].any():
+                possible_circles.append((center, radius, self.unique_cycles[i]))
+                claimed[edges] = True
             else:
-                unused_loops.append(polygon)
-
-        filtered_unused_loops = []
-        for loop in unused_loops:
-            all_sides_unused = True
-            for i in range(len(loop)):
-                side = tuple(sorted([tuple(loop[i]), tuple(loop[(i + 1) % len(loop)])]))
-                if side in self.marked_sides:
-                    all_sides_unused = False
-                    break
-            if all_sides_unused:
-                filtered_unused_loops.append(loop)
-
-        # plt.figure()
-
-        # self.plot_remaining_sides(self.unique_cycles, self.marked_sides)
-        for polygon in self.unique_cycles:
-            polygon = np.array(polygon)
-            for i in range(len(polygon)):
-                side = tuple(sorted([tuple(polygon[i]), tuple(polygon[(i + 1) % len(polygon)])]))
-                if side not in self.marked_sides:
-                    self.remaining_sides.add(side)
-
-        self.remaining_sides = set([
-            ((float(x1), float(y1)), (float(x2), float(y2)))
-            for ((x1, y1), (x2, y2)) in self.remaining_sides
-        ])
-
-        # for center, radius, polygon in possible_circles:
-        #     self.plot_polygon_and_circle(polygon, center, radius, label='Best Fit Circle')
+                unused.append(i)
 
-        # plt.legend()
-        # plt.axis('equal')
-        # plt.show()
+        kept_loops = [i for i in unused if not claimed[self.cycle_edges[i]].any()]
+        covered = claimed.copy()
+        for i in kept_loops:
+            covered[self.cycle_edges[i]] = True
 
-        return filtered_unused_loops, possible_circles
+        self.marked_sides = {self.edge_sides[j] for j in np.flatnonzero(claimed)}
+        self.remaining_sides = [self.edge_sides[j] for j in np.flatnonzero(~covered)]
+        return [self.unique_cycles[i] for i in kept_loops], possible_circles
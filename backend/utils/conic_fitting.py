@@ -0,0 +1,218 @@
+import numpy as np
+
+
+def chain_strokes(strokes):
+    """Group strokes that continue one another end to start into chains of stroke indices.
+
+    Only unambiguous joins are followed, an end point shared by more than two
+    strokes starts new chains, so chains never run through junctions.
+    """
+    starts, ends = {}, {}
+    for i, stroke in enumerate(strokes):
+        starts.setdefault(tuple(stroke[0]), []).append(i)
+        ends.setdefault(tuple(stroke[-1]), []).append(i)
+
+    following = {}
+    for i, stroke in enumerate(strokes):
+        end = tuple(stroke[-1])
+        if len(starts.get(end, [])) == 1 and len(ends[end]) == 1 and starts[end][0] != i:
+            following[i] = starts[end][0]
+    preceded = set(following.values())
+
+    chains, visited = [], set()
+    # chain heads first, then whatever is left, which can only be closed loops
+    for head in [i for i in range(len(strokes)) if i not in preceded] + list(range(len(strokes))):
+        if head in visited:
+            continue
+        chain = [head]
+        visited.add(head)
+        while chain[-1] in following and following[chain[-1]] not in visited:
+            chain.append(following[chain[-1]])
+            visited.add(chain[-1])
+        chains.append(chain)
+    return chains
+
+
+class StrokeClassifier:
+    """Classify open strokes as lines, circular arcs or elliptical arcs, all strokes at once.
+
+    Strokes are concatenated and every fit is reduced per stroke with
+    ``reduceat``: a total least squares line, an algebraic circle and the
+    direct least squares ellipse of Fitzgibbon et al. in the numerically
+    stable form of Halir and Flusser. Each stroke becomes the simplest
+    primitive whose RMS residual is within ``tolerance``, and stays a
+    polyline when none is. Fits are done in per-stroke normalised
+    coordinates so the scatter matrices stay well conditioned.
+    """
+
+    def __init__(self, strokes, tolerance=1.5, max_axis_ratio=8.0):
+        self.strokes = [np.asarray(stroke, dtype=float).reshape(-1, 2) for stroke in strokes]
+        self.tolerance = tolerance
+        self.max_axis_ratio = max_axis_ratio
+
+    def concatenate(self, strokes):
+        counts = np.array([len(stroke) for stroke in strokes])
+        offsets = np.cumsum(counts) - counts
+        owner = np.repeat(np.arange(len(strokes)), counts)
+        return np.concatenate(strokes), counts, offsets, owner
+
+    def normalize(self, points, counts, offsets, owner):
+        means = np.add.reduceat(points, offsets, axis=0) / counts[:, None]
+        centered = points - means[owner]
+        scales = np.sqrt(np.add.reduceat(np.sum(centered ** 2, axis=1), offsets) / counts)
+        scales = np.where(scales > 0, scales, 1.0)
+        return centered / scales[owner, None], means, scales
+
+    def rms(self, residuals, counts, offsets):
+        return np.sqrt(np.add.reduceat(residuals ** 2, offsets) / counts)
+
+    def fit_lines(self, u, counts, offsets, owner):
+        """Unit direction and RMS perpendicular residual (normalised units) of the total least squares line."""
+        sxx = np.add.reduceat(u[:, 0] ** 2, offsets)
+        sxy = np.add.reduceat(u[:, 0] * u[:, 1], offsets)
+        syy = np.add.reduceat(u[:, 1] ** 2, offsets)
+        angle = 0.5 * np.arctan2(2 * sxy, sxx - syy)
+        directions = np.column_stack([np.cos(angle), np.sin(angle)])
+        normals = np.column_stack([-directions[:, 1], directions[:, 0]])
+        return directions, self.rms(np.sum(u * normals[owner], axis=1), counts, offsets)
+
+    def fit_circles(self, u, counts, offsets, owner):
+        """Center, radius and RMS radial residual of the algebraic circle x^2 + y^2 + Dx + Ey + F = 0."""
+        design = np.column_stack([u, np.ones(len(u))])
+        target = -np.sum(u ** 2, axis=1)
+        normal = np.add.reduceat(design[:, :, None] * design[:, None, :], offsets, axis=0)
+        rhs = np.add.reduceat(design * target[:, None], offsets, axis=0)
+        d, e, f = np.einsum('sij,sj->si', np.linalg.pinv(normal), rhs).T
+
+        centers = np.column_stack([-d / 2, -e / 2])
+        radii = np.sqrt(np.maximum(d ** 2 / 4 + e ** 2 / 4 - f, 0))
+        residuals = np.linalg.norm(u - centers[owner], axis=1) - radii[owner]
+        return centers, radii, self.rms(residuals, counts, offsets)
+
+    def fit_ellipses(self, u, counts, offsets, owner):
+        """Center, semi-axes, rotation and RMS Sampson residual of the direct least squares ellipse.
+
+        Invalid fits (no ellipse-specific eigenvector, or a hyperbola after
+        rounding) get an infinite residual.
+        """
+        x, y = u[:, 0], u[:, 1]
+        quadratic = np.column_stack([x * x, x * y, y * y])
+        linear = np.column_stack([x, y, np.ones(len(u))])
+        s1 = np.add.reduceat(quadratic[:, :, None] * quadratic[:, None, :], offsets, axis=0)
+        s2 = np.add.reduceat(quadratic[:, :, None] * linear[:, None, :], offsets, axis=0)
+        s3 = np.add.reduceat(linear[:, :, None] * linear[:, None, :], offsets, axis=0)
+
+        t = -np.linalg.pinv(s3) @ np.transpose(s2, (0, 2, 1))
+        m = s1 + s2 @ t
+        # premultiply by the inverse of the constraint matrix 4ac - b^2 = 1
+        m = np.stack([m[:, 2] / 2, -m[:, 1], m[:, 0] / 2], axis=1)
+        _, vectors = np.linalg.eig(m)
+        vectors = vectors.real
+        condition = 4 * vectors[:, 0, :] * vectors[:, 2, :] - vectors[:, 1, :] ** 2
+        choice = np.argmax(condition, axis=1)
+        valid = condition[np.arange(len(choice)), choice] > 0
+
+        a1 = vectors[np.arange(len(choice)), :, choice]
+        a2 = np.einsum('sij,sj->si', t, a1)
+        a, b, c = a1.T
+        d, e, f = a2.T
+
+        # center from the gradient, then semi-axes from the quadratic form there
+        quadratic_form = np.stack([np.stack([a, b / 2], axis=-1), np.stack([b / 2, c], axis=-1)], axis=1)
+        # a (near) singular form is a parabola or a line, rounding can still leave it "elliptic"
+        valid &= np.abs(np.linalg.det(quadratic_form)) > 1e-10 * np.sum(a1 ** 2, axis=1)
+        # invalid fits get an identity added so the batched solve never meets a singular matrix
+        safe_form = quadratic_form + np.where(valid, 0, 1)[:, None, None] * np.eye(2)
+        centers = np.linalg.solve(safe_form, -np.column_stack([d, e])[:, :, None] / 2)[:, :, 0]
+        value = f + (d * centers[:, 0] + e * centers[:, 1]) / 2
+        eigenvalues, axes = np.linalg.eigh(quadratic_form)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            squared_radii = -value[:, None] / eigenvalues
+        valid &= np.all(squared_radii > 0, axis=1)
+        radii = np.sqrt(np.where(squared_radii > 0, squared_radii, 1))
+        rotations = np.arctan2(axes[:, 1, 0], axes[:, 0, 0])
+
+        coefficients = np.column_stack([a, b, c, d, e, f])[owner]
+        conic = np.sum(coefficients * np.column_stack([quadratic, linear]), axis=1)
+        gradient = np.column_stack([2 * coefficients[:, 0] * x + coefficients[:, 1] * y + coefficients[:, 3],
+                                    coefficients[:, 1] * x + 2 * coefficients[:, 2] * y + coefficients[:, 4]])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sampson = conic / np.linalg.norm(gradient, axis=1)
+        residuals = np.where(valid, self.rms(np.nan_to_num(sampson, nan=np.inf), counts, offsets), np.inf)
+        return centers, radii, rotations, residuals
+
+    def swept_angles(self, angles, offsets):
+        """Start angle and signed sweep of each stroke from its per-point angles."""
+        steps = np.diff(angles, prepend=angles[:1])
+        steps = (steps + np.pi) % (2 * np.pi) - np.pi
+        steps[offsets] = 0
+        return angles[offsets], np.add.reduceat(steps, offsets)
+
+    def classify_chains(self):
+        """Fit each chain of continuing strokes as one primitive, and its strokes one by one where that fails.
+
+        Returns ``(stroke indices, kind, parameters)`` per emitted primitive.
+        """
+        chains = chain_strokes(self.strokes)
+        joined = [np.concatenate([self.strokes[chain[0]][:1]] + [self.strokes[i][1:] for i in chain]) for chain in chains]
+        chain_results = StrokeClassifier(joined, self.tolerance, self.max_axis_ratio).classify()
+
+        results = []
+        for chain, (kind, parameters) in zip(chains, chain_results):
+            if kind != 'polyline' or len(chain) == 1:
+                results.append((chain, kind, parameters))
+        pending = [i for chain, (kind, _) in zip(chains, chain_results) if kind == 'polyline' and len(chain) > 1 for i in chain]
+        piece_results = StrokeClassifier([self.strokes[i] for i in pending], self.tolerance, self.max_axis_ratio).classify()
+        results += [([i], kind, parameters) for i, (kind, parameters) in zip(pending, piece_results)]
+        return results
+
+    def classify(self):
+        """One ``(kind, parameters)`` per stroke: ``line``, ``arc``, ``elliptical_arc`` or ``polyline``.
+
+        Parameters are ``(start, end)``, ``(center, radius, start_angle, sweep)``,
+        ``(center, radii, rotation, start_angle, sweep)`` and ``(points,)``.
+        """
+        results = [('polyline', (stroke,)) for stroke in self.strokes]
+        fittable = [i for i, stroke in enumerate(self.strokes) if len(stroke) >= 2]
+        if fittable:
+            for i, result in zip(fittable, self.fit([self.strokes[i] for i in fittable])):
+                results[i] = result
+        return results
+
+    def fit(self, strokes):
+        points, counts, offsets, owner = self.concatenate(strokes)
+        u, means, scales = self.normalize(points, counts, offsets, owner)
+        tolerance = self.tolerance / scales
+
+        directions, line_residuals = self.fit_lines(u, counts, offsets, owner)
+        with np.errstate(all='ignore'):
+            circle_centers, circle_radii, circle_residuals = self.fit_circles(u, counts, offsets, owner)
+            ellipse_centers, ellipse_radii, rotations, ellipse_residuals = self.fit_ellipses(u, counts, offsets, owner)
+
+        # circle angles, and eccentric anomalies on each ellipse's own axes
+        offset = u - circle_centers[owner]
+        arc_start, arc_sweep = self.swept_angles(np.arctan2(offset[:, 1], offset[:, 0]), offsets)
+        offset = u - ellipse_centers[owner]
+        cos_r, sin_r = np.cos(rotations)[owner], np.sin(rotations)[owner]
+        local_x = (offset[:, 0] * cos_r + offset[:, 1] * sin_r) / ellipse_radii[owner, 0]
+        local_y = (-offset[:, 0] * sin_r + offset[:, 1] * cos_r) / ellipse_radii[owner, 1]
+        ellipse_start, ellipse_sweep = self.swept_angles(np.arctan2(local_y, local_x), offsets)
+
+        axis_ratio = ellipse_radii.max(axis=1) / ellipse_radii.min(axis=1)
+        results = []
+        for i, stroke in enumerate(strokes):
+            if line_residuals[i] <= tolerance[i]:
+                along = (stroke[[0, -1]] - means[i]) @ directions[i]
+                start, end = means[i] + along[:, None] * directions[i]
+                results.append(('line', (start, end)))
+            elif counts[i] >= 3 and circle_residuals[i] <= tolerance[i] and abs(arc_sweep[i]) < 2 * np.pi:
+                center = means[i] + circle_centers[i] * scales[i]
+                results.append(('arc', (center, circle_radii[i] * scales[i], arc_start[i], arc_sweep[i])))
+            elif (counts[i] >= 5 and ellipse_residuals[i] <= tolerance[i] and axis_ratio[i] <= self.max_axis_ratio
+                  and abs(ellipse_sweep[i]) < 2 * np.pi):
+                center = means[i] + ellipse_centers[i] * scales[i]
+                results.append(('elliptical_arc', (center, ellipse_radii[i] * scales[i], rotations[i],
+                                                   ellipse_start[i], ellipse_sweep[i])))
+            else:
+                results.append(('polyline', (stroke,)))
+        return results
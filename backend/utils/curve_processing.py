@@ -5,50 +5,125 @@ from collections import defaultdict
 from typing import List, Tuple
 import numpy as np
 import matplotlib.pyplot as plt
+from utils.geometry import arc_lengths, close_pairs, line_distances
 
 class CurveProcessor:
-    def __init__(self, curves: dict[int, List[Tuple[float, float]]], epsilon: float = 5.0, threshold: float = 5.0):
+    def __init__(self, curves: dict[int, List[Tuple[float, float]]], epsilon: float = 5.0, threshold: float = 5.0,
+                 decimation_fraction: float = 0.1, importance: dict[int, np.ndarray] = None):
         self.curves = curves
+        self.importance = importance
         self.epsilon = epsilon
         self.threshold = threshold
+        self.decimation_fraction = decimation_fraction
+        self.decimation_stats = {}
         self.simplified_curves = {}
         self.inverse_dict = {}
         self.segment_points_dict = {}
         self.updated_curves = {}
 
-    def point_line_distance(self, point, start, end):
-        point = np.array(point)
-        start = np.array(start)
-        end = np.array(end)
-        
-        if np.array_equal(start, end):
-            return np.linalg.norm(point - start)
-        else:
-            n = abs((end[1] - start[1]) * point[0] - (end[0] - start[0]) * point[1] + end[0] * start[1] - end[1] * start[0])
-            d = np.linalg.norm(end - start)
-            return n / d
+    def decimation_mask(self, points, tolerance):
+        """Keep the first point of every run closer than ``tolerance`` (by arc length) to the last kept one."""
+        cumulative = arc_lengths(points)
+        moved = np.r_[True, np.diff(cumulative) > 0]
+        if tolerance <= 0:
+            return moved
+
+        buckets = np.floor(cumulative / tolerance)
+        keep = moved & np.r_[True, buckets[1:] != buckets[:-1]]
+        if not keep[-1]:
+            # the stroke must end on its original end point, which replaces the last kept one in its bucket
+            last_kept = np.flatnonzero(keep)[-1]
+            if last_kept > 0 and buckets[last_kept] == buckets[-1]:
+                keep[last_kept] = False
+            keep[-1] = True
+        return keep
+
+    def rdp_importance(self, points):
+        """Largest epsilon at which Ramer-Douglas-Peucker still keeps each point.
+
+        RDP splits every range at its farthest interior point whatever the
+        tolerance, and only stops splitting sooner for larger ones, so one full
+        pass records the whole hierarchy. A point survives while its own split
+        distance and every enclosing one exceed epsilon, hence the running
+        minimum down the recursion. End points are always kept.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        importance = np.zeros(len(points))
+        importance[[0, -1]] = np.inf
+
+        # every range of one recursion depth is split at once
+        first, last, bound = np.array([0]), np.array([len(points) - 1]), np.array([np.inf])
+        while len(first):
+            interior = last - first - 1
+            splittable = interior > 0
+            first, last, bound, interior = first[splittable], last[splittable], bound[splittable], interior[splittable]
+            if not len(first):
+                break
+
+            offsets = np.cumsum(interior) - interior
+            owner = np.repeat(np.arange(len(first)), interior)
+            indices = np.arange(interior.sum()) - offsets[owner] + first[owner] + 1
+            distances = line_distances(points[indices], points[first[owner]], points[last[owner]])
+
+            # the first farthest point of each range, as the recursive version picks it
+            farthest = np.flatnonzero(distances == np.maximum.reduceat(distances, offsets)[owner])
+            farthest = farthest[np.r_[True, owner[farthest[1:]] != owner[farthest[:-1]]]]
+            split = indices[farthest]
+            importance[split] = np.minimum(distances[farthest], bound)
+
+            first, last = np.r_[first, split], np.r_[split, last]
+            bound = np.r_[importance[split], importance[split]]
+        return importance
+
+    def compute_importance(self):
+        self.importance = {index: self.rdp_importance(points) for index, points in self.curves.items() if len(points)}
+        return self.importance
+
+    def rdp_indices(self, importance, epsilon):
+        """Indices RDP keeps at ``epsilon``, a threshold on the precomputed importance."""
+        indices = np.flatnonzero(importance > epsilon).tolist()
+        # a single point still yields one degenerate segment
+        return indices if len(indices) > 1 else [0, 0]
+
+    def decimate_curves(self):
+        """Drop duplicate and sub-tolerance points so later stages see fewer points.
+
+        Every dropped point lies within ``decimation_fraction * epsilon`` of a kept
+        neighbour along the stroke, so the simplified output moves by at most that
+        much. Points RDP keeps at ``epsilon`` are never dropped, and their
+        importance is carried over to the decimated stroke. Importance is
+        computed on the raw strokes beforehand, so decimation trims the
+        segment points and the stages after RDP but not RDP itself.
+        """
+        tolerance = self.decimation_fraction * self.epsilon
+        decimated = {}
+        importance = {}
+        input_points = output_points = 0
+
+        for index, points in self.curves.items():
+            array = np.asarray(points, dtype=float).reshape(-1, 2)
+            input_points += len(array)
+            point_importance = self.importance.get(index)
+            if len(array) > 2:
+                keep = self.decimation_mask(array, tolerance) | (point_importance > self.epsilon)
+                array = array[keep]
+                point_importance = point_importance[keep]
+                points = list(map(tuple, array.tolist()))
+            importance[index] = point_importance
+            output_points += len(points)
+            decimated[index] = points
+
+        self.curves = decimated
+        self.importance = importance
+        self.decimation_stats = {
+            'input_points': input_points,
+            'output_points': output_points,
+            'reduction_ratio': 1 - output_points / input_points if input_points else 0.0,
+        }
 
     def ramer_douglas_peucker(self, points, epsilon):
-        dmax = 0.0
-        index = 0
-        end = len(points)
-        for i in range(1, end - 1):
-            # print(points)
-            d = self.point_line_distance(points[i], points[0], points[-1])
-            if d > dmax:
-                index = i
-                dmax = d
-
-        if dmax > epsilon:
-            rec_results1, idx1 = self.ramer_douglas_peucker(points[:index+1], epsilon)
-            rec_results2, idx2 = self.ramer_douglas_peucker(points[index:], epsilon)
-            result = rec_results1[:-1] + rec_results2
-            result_indices = idx1[:-1] + [i + index for i in idx2]
-        else:
-            result = [points[0], points[-1]]
-            result_indices = [0, len(points) - 1]
-
-        return result, result_indices
+        indices = self.rdp_indices(self.rdp_importance(points), epsilon)
+        return [points[i] for i in indices], indices
 
     def simplify_curves(self):
         simplified_curves = {}
@@ -57,7 +132,8 @@ class CurveProcessor:
         segment_id = 0
 
         for index, points in self.curves.items():
-            simplified_points, indices = self.ramer_douglas_peucker(points, self.epsilon)
+            indices = self.rdp_indices(self.importance[index], self.epsilon)
+            simplified_points = [points[i] for i in indices]
 
             for i in range(len(simplified_points) - 1):
                 start_point = tuple(simplified_points[i])
@@ -78,9 +154,6 @@ class CurveProcessor:
         self.inverse_dict = inverse_dict
         self.segment_points_dict = segment_points_dict
 
-    def distance(self, point1, point2):
-        return np.linalg.norm(np.array(point1) - np.array(point2))
-
     def midpoint(self, point1, point2):
         return ((point1[0] + point2[0]) / 2, (point1[1] + point2[1]) / 2)
 
@@ -95,31 +168,33 @@ class CurveProcessor:
         for key, points in self.simplified_curves.items():
             endpoints[key] = (points[0], points[-1])
 
-        for key, (start, end) in endpoints.items():
-            if self.distance(start, end) < self.threshold:
-                mid = self.midpoint(start, end)
-                updated_curves[key][0] = mid
-                updated_curves[key][-1] = mid
-
-        for key1, (start1, end1) in endpoints.items():
-            for key2, (start2, end2) in endpoints.items():
-                if key1 < key2:
-                    if self.distance(start1, start2) < self.threshold:
-                        mid = self.midpoint(start1, start2)
-                        updated_curves[key1][0] = mid
-                        updated_curves[key2][0] = mid
-                    if self.distance(start1, end2) < self.threshold:
-                        mid = self.midpoint(start1, end2)
-                        updated_curves[key1][0] = mid
-                        updated_curves[key2][-1] = mid
-                    if self.distance(end1, start2) < self.threshold:
-                        mid = self.midpoint(end1, start2)
-                        updated_curves[key1][-1] = mid
-                        updated_curves[key2][0] = mid
-                    if self.distance(end1, end2) < self.threshold:
-                        mid = self.midpoint(end1, end2)
-                        updated_curves[key1][-1] = mid
-                        updated_curves[key2][-1] = mid
+        keys = list(endpoints)
+        starts = np.array([endpoints[key][0] for key in keys], dtype=float).reshape(-1, 2)
+        ends = np.array([endpoints[key][1] for key in keys], dtype=float).reshape(-1, 2)
+
+        for i in np.flatnonzero(np.linalg.norm(starts - ends, axis=1) < self.threshold):
+            key = keys[i]
+            start, end = endpoints[key]
+            mid = self.midpoint(start, end)
+            updated_curves[key][0] = mid
+            updated_curves[key][-1] = mid
+
+        # (start/end of the lower key, start/end of the higher key), in the order later snaps overwrite earlier ones
+        pairings = [(0, 0), (0, -1), (-1, 0), (-1, -1)]
+        pairs = close_pairs(np.concatenate([starts, ends]), self.threshold)
+        owners, sides = pairs % len(keys), pairs // len(keys)
+        key_array = np.array(keys)
+        # orient each pair lower key first, pairs within one curve are dropped
+        swap = key_array[owners[:, 0]] > key_array[owners[:, 1]]
+        owners[swap], sides[swap] = owners[swap, ::-1], sides[swap, ::-1]
+        keep = key_array[owners[:, 0]] < key_array[owners[:, 1]]
+        snaps = np.column_stack([owners[keep], 2 * sides[keep, 0] + sides[keep, 1]])
+        for i, j, pairing in snaps[np.lexsort(snaps.T[::-1])].tolist():
+            key1, key2 = keys[i], keys[j]
+            a, b = pairings[pairing]
+            mid = self.midpoint(endpoints[key1][a], endpoints[key2][b])
+            updated_curves[key1][a] = mid
+            updated_curves[key2][b] = mid
 
         for key, points in updated_curves.items():
             updated_curves[key] = [self.round_point(point) for point in points]
@@ -159,6 +234,9 @@ class CurveProcessor:
         plt.show()
 
     def process(self):
+        if self.importance is None:
+            self.compute_importance()
+        self.decimate_curves()
         self.simplify_curves()
         self.update_endpoints_with_midpoints()
         # self.plot_segments(self.simplified_curves, self.inverse_dict, "Original Simplified Curves")
@@ -21,33 +21,101 @@ class CycleDetector:
                 segments.append((start, end))
         return adj_list, segments
 
-    def find_cycles(self, graph):
-        def dfs(node, start, visited, path):
-            visited[node] = True
-            path.append(node)
+    def is_junction(self, graph, node):
+        neighbors = graph[node]
+        return len(neighbors) != 2 or neighbors[0] == neighbors[1] or node in neighbors
 
-            for neighbor in graph[node]:
-                if neighbor == start and len(path) > 2:
-                    cycle = path[:] + [start]
-                    cycles.append(cycle)
-                elif not visited[neighbor]:
-                    dfs(neighbor, start, visited, path)
+    def contract_chains(self, graph):
+        """Contract runs of degree-2 vertices into super-edges between junction vertices.
 
-            path.pop()
-            visited[node] = False
+        Returns the junctions in graph order and, for each junction, one
+        ``chain`` per adjacency entry in the same order: the full vertex path
+        from the junction to the next junction. Components that are a bare
+        loop get their first vertex promoted to a junction.
+        """
+        junctions = [node for node in graph if self.is_junction(graph, node)]
+        chains = {}
 
-        cycles = []
-        visited = defaultdict(bool)
+        def walk(junction, first):
+            chain = [junction, first]
+            while chain[-1] not in chains:
+                a, b = graph[chain[-1]]
+                chain.append(b if a == chain[-2] else a)
+            return tuple(chain)
 
+        for junction in junctions:
+            chains[junction] = []
+        for junction in junctions:
+            chains[junction] = [walk(junction, neighbor) for neighbor in graph[junction]]
+
+        on_chain = {node for junction in junctions for chain in chains[junction] for node in chain}
         for node in graph:
-            if not visited[node]:
-                dfs(node, node, visited, [])
+            if node not in on_chain:
+                junctions.append(node)
+                chains[node] = []
+                chains[node] = [walk(node, neighbor) for neighbor in graph[node]]
+                on_chain.update(chains[node][0])
+        return junctions, chains
+
+    def canonical_cycle(self, graph, order, cycle):
+        """Rotate and orient a closed vertex list the way a DFS over the full graph first meets it.
+
+        That DFS starts from every vertex in graph order and tries neighbours
+        in adjacency order, so it first finds a cycle from its earliest vertex,
+        in the direction whose sequence of adjacency indices is smallest.
+        """
+        ring = list(cycle[:-1])
+        start = min(range(len(ring)), key=lambda i: order[ring[i]])
+        ring = ring[start:] + ring[:start]
+        best = None
+        for candidate in (ring, ring[:1] + ring[:0:-1]):
+            path = candidate + candidate[:1]
+            key = (order[path[0]],) + tuple(graph[a].index(b) for a, b in zip(path, path[1:]))
+            if best is None or key < best[0]:
+                best = (key, path)
+        return best
+
+    def find_cycles(self, graph):
+        """All simple cycles of at least three vertices, one per vertex set, as closed vertex lists.
+
+        The search runs on the junction graph from ``contract_chains``, so
+        only junctions branch, and found cycles are expanded back to full
+        vertex paths. Results match an exhaustive DFS from every vertex of
+        ``graph``: same cycles, same order, same starting vertex and
+        direction.
+        """
+        junctions, chains = self.contract_chains(graph)
+        order = {node: i for i, node in enumerate(graph)}
+
+        def dfs(node, start, visited, path):
+            visited.add(node)
+            for chain in chains[node]:
+                end = chain[-1]
+                if end == start:
+                    cycle = path + list(chain[1:])
+                    # three distinct vertices, and not straight back along the chain it left by
+                    if len(cycle) > 3 and tuple(cycle[::-1]) != tuple(cycle):
+                        found.append(cycle)
+                elif end not in visited:
+                    dfs(end, start, visited, path + list(chain[1:]))
+            visited.discard(node)
+
+        found = []
+        for junction in junctions:
+            dfs(junction, junction, set(), [junction])
+
+        candidates = {}
+        for cycle in found:
+            key, path = self.canonical_cycle(graph, order, cycle)
+            candidates[key] = path
 
         unique_cycles = []
-        for cycle in cycles:
-            cycle_set = set(cycle)
-            if all(cycle_set != set(c) for c in unique_cycles):
-                unique_cycles.append(cycle)
+        seen = set()
+        for key in sorted(candidates):
+            vertices = frozenset(candidates[key])
+            if vertices not in seen:
+                seen.add(vertices)
+                unique_cycles.append(candidates[key])
 
         return unique_cycles
 
@@ -0,0 +1,156 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Batched geometry kernels shared by the pipeline stages. Points are (..., 2)
+# arrays; "pairwise" kernels return one value per (point, other) pair.
+
+
+def as_points(points):
+    return np.asarray(points, dtype=float).reshape(-1, 2)
+
+
+def point_distances(a, b):
+    """(..., N, M) Euclidean distances between every point of ``a`` and every point of ``b``.
+
+    Leading axes of either argument broadcast, so one point set can be
+    compared against a batch of others.
+    """
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    return np.linalg.norm(a[..., :, None, :] - b[..., None, :, :], axis=-1)
+
+
+def close_pairs(points, tolerance):
+    """(P, 2) index pairs ``i < j`` of points strictly closer than ``tolerance``, in lexicographic order.
+
+    Found through a k-d tree, so memory grows with the number of pairs
+    rather than with the square of the number of points.
+    """
+    points = as_points(points)
+    if len(points) < 2:
+        return np.empty((0, 2), dtype=np.intp)
+    pairs = cKDTree(points).query_pairs(tolerance, output_type='ndarray')
+    pairs = pairs[np.linalg.norm(points[pairs[:, 0]] - points[pairs[:, 1]], axis=1) < tolerance]
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def segment_distances(points, starts, ends, squared=False):
+    """(..., N, M) distances from every point to every segment.
+
+    Leading axes of the points and of the segments broadcast, so a batch of
+    point sets or a batch of polylines can be measured in one call.
+    Zero-length segments measure the distance to their single point.
+    """
+    points = np.asarray(points, dtype=float)
+    starts = np.asarray(starts, dtype=float)
+    direction = np.asarray(ends, dtype=float) - starts
+    # x and y are handled separately, reductions over a length-2 axis are slow
+    dx, dy = direction[..., None, :, 0], direction[..., None, :, 1]
+    length2 = dx * dx + dy * dy
+
+    ox = points[..., :, None, 0] - starts[..., None, :, 0]
+    oy = points[..., :, None, 1] - starts[..., None, :, 1]
+    t = np.clip((ox * dx + oy * dy) / np.where(length2 > 0, length2, 1), 0, 1)
+    ox -= t * dx
+    oy -= t * dy
+    distance2 = ox * ox + oy * oy
+    return distance2 if squared else np.sqrt(distance2)
+
+
+def line_distances(points, starts, ends):
+    """Distance from each point to the infinite line through ``starts`` and ``ends``, or to ``starts`` where they coincide.
+
+    Lines broadcast against the points, so every point may have its own line.
+    """
+    points = np.asarray(points, dtype=float)
+    starts = np.asarray(starts, dtype=float)
+    direction = np.asarray(ends, dtype=float) - starts
+    offset = points - starts
+    length = np.sqrt(direction[..., 0] * direction[..., 0] + direction[..., 1] * direction[..., 1])
+    to_start = np.sqrt(offset[..., 0] * offset[..., 0] + offset[..., 1] * offset[..., 1])
+    return np.where(length > 0, np.abs(cross(direction, offset)) / np.where(length > 0, length, 1), to_start)
+
+
+def cross(a, b):
+    """z component of the cross product of 2-D vectors, broadcast over leading axes."""
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def triangle_areas(p1, p2, p3):
+    """Unsigned areas of the triangles (p1, p2, p3), broadcast over leading axes."""
+    p1 = np.asarray(p1, dtype=float)
+    return 0.5 * np.abs(cross(np.asarray(p2) - p1, np.asarray(p3) - p1))
+
+
+def turning_angles(previous, current, following):
+    """Angle in degrees between the directions previous->current and current->following; 0 where either is degenerate."""
+    current = np.asarray(current, dtype=float)
+    incoming = current - np.asarray(previous, dtype=float)
+    outgoing = np.asarray(following, dtype=float) - current
+    norms = np.linalg.norm(incoming, axis=-1) * np.linalg.norm(outgoing, axis=-1)
+    cosine = np.sum(incoming * outgoing, axis=-1) / np.where(norms > 0, norms, 1)
+    return np.where(norms > 0, np.degrees(np.arccos(np.clip(cosine, -1, 1))), 0.0)
+
+
+def unit_vectors(vectors):
+    """Vectors scaled to unit length; zero vectors stay zero."""
+    vectors = np.asarray(vectors, dtype=float)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def slopes(starts, ends):
+    """dy / dx of each segment, ``inf`` for vertical ones."""
+    starts, ends = as_points(starts), as_points(ends)
+    dx, dy = ends[:, 0] - starts[:, 0], ends[:, 1] - starts[:, 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(dx == 0, np.inf, dy / np.where(dx == 0, 1, dx))
+
+
+def sample_segments(starts, ends, num_points=30):
+    """(M, num_points, 2) points spaced evenly along each segment, end points included."""
+    starts, ends = as_points(starts), as_points(ends)
+    t = np.linspace(0, 1, num_points)[None, :, None]
+    return starts[:, None, :] + t * (ends - starts)[:, None, :]
+
+
+def closed_edges(vertices):
+    """Start and end points of every edge of a closed polygon, including the closing one."""
+    vertices = np.asarray(vertices, dtype=float)
+    return vertices, np.roll(vertices, -1, axis=-2)
+
+
+def edge_lengths(vertices):
+    starts, ends = closed_edges(vertices)
+    return np.linalg.norm(ends - starts, axis=-1)
+
+
+def arc_lengths(points):
+    """Cumulative length along an open polyline, starting at 0."""
+    points = as_points(points)
+    return np.r_[0, np.cumsum(np.linalg.norm(np.diff(points, axis=0), axis=1))]
+
+
+def circle_distances(points, centers, radii):
+    """Distance from points to circles, ``| |p - c| - r |``, broadcast over leading axes."""
+    points, centers = np.asarray(points, dtype=float), np.asarray(centers, dtype=float)
+    return np.abs(np.linalg.norm(points - centers, axis=-1) - radii)
+
+
+def circumcircles(a, b, c):
+    """Centers and radii of the circles through each triple; NaN where the points are collinear."""
+    a, b, c = np.asarray(a, dtype=float), np.asarray(b, dtype=float), np.asarray(c, dtype=float)
+    d = 2 * (a[..., 0] * (b[..., 1] - c[..., 1]) + b[..., 0] * (c[..., 1] - a[..., 1]) + c[..., 0] * (a[..., 1] - b[..., 1]))
+    a2, b2, c2 = np.sum(a ** 2, axis=-1), np.sum(b ** 2, axis=-1), np.sum(c ** 2, axis=-1)
+    safe_d = np.where(d == 0, np.nan, d)
+    ux = (a2 * (b[..., 1] - c[..., 1]) + b2 * (c[..., 1] - a[..., 1]) + c2 * (a[..., 1] - b[..., 1])) / safe_d
+    uy = (a2 * (c[..., 0] - b[..., 0]) + b2 * (a[..., 0] - c[..., 0]) + c2 * (b[..., 0] - a[..., 0])) / safe_d
+    centers = np.stack([ux, uy], axis=-1)
+    return centers, np.linalg.norm(centers - a, axis=-1)
+
+
+def regular_polygons(center, radii, n_vertices, rotations):
+    """(len(radii), len(rotations), n_vertices, 2) vertices of regular polygons for every radius and rotation."""
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)[None, :] + np.asarray(rotations, dtype=float)[:, None]
+    unit = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+    return np.asarray(center, dtype=float) + np.asarray(radii, dtype=float)[:, None, None, None] * unit[None]
@@ -0,0 +1,148 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from utils.geometry import arc_lengths, triangle_areas, unit_vectors
+
+
+class OcclusionCompleter:
+    """Bridge gaps left by occluders with single cubic Béziers.
+
+    Dangling stroke ends are paired through a k-d tree, so each end is only
+    compared with its ``max_neighbours`` nearest ends within ``max_gap``,
+    however densely ends cluster, and a pair is kept only if both ends point
+    into the gap. Pairs are ranked by how well the arc that bridges them
+    agrees with the osculating circles at both ends. Control points for
+    every selected gap are solved together.
+    """
+
+    def __init__(self, strokes, max_gap=60.0, snap_tolerance=2.0, max_angle=60.0, window=6.0, max_neighbours=16):
+        self.strokes = [np.asarray(stroke, dtype=float) for stroke in strokes if len(stroke) >= 2]
+        self.max_gap = max_gap
+        self.max_neighbours = max_neighbours
+        self.snap_tolerance = snap_tolerance
+        self.min_alignment = np.cos(np.radians(max_angle))
+        self.window = window
+        self.completions = []
+
+    def point_at_length(self, stroke, length):
+        """Point ``length`` along the stroke from its first point."""
+        cumulative = arc_lengths(stroke)
+        length = min(length, cumulative[-1])
+        return np.array([np.interp(length, cumulative, stroke[:, 0]),
+                         np.interp(length, cumulative, stroke[:, 1])]), cumulative[-1]
+
+    def stroke_ends(self):
+        """End points with the two points one and two windows back along the stroke."""
+        ends, inner, outer, lengths = [], [], [], []
+        for stroke in self.strokes:
+            for oriented in (stroke, stroke[::-1]):
+                # oriented runs from the end being described towards the interior
+                p1, length = self.point_at_length(oriented, self.window)
+                p2, _ = self.point_at_length(oriented, 2 * self.window)
+                ends.append(oriented[0])
+                inner.append(p1)
+                outer.append(p2)
+                lengths.append(length)
+        return np.array(ends), np.array(inner), np.array(outer), np.array(lengths)
+
+    def end_geometry(self, ends, inner, outer):
+        """Outward unit tangents and unsigned curvature at each end."""
+        tangents = unit_vectors(ends - inner)
+
+        # curvature of the circle through the three points, 4 * area / (a * b * c)
+        a = np.linalg.norm(ends - inner, axis=1)
+        b = np.linalg.norm(inner - outer, axis=1)
+        c = np.linalg.norm(ends - outer, axis=1)
+        denominator = a * b * c
+        curvature = np.divide(4 * triangle_areas(ends, inner, outer), denominator, out=np.zeros_like(a), where=denominator > 0)
+        return tangents, curvature
+
+    def dangling_ends(self, ends):
+        tree = cKDTree(ends)
+        neighbours = tree.query_ball_point(ends, self.snap_tolerance, return_length=True)
+        return np.flatnonzero(neighbours == 1)
+
+    def gap_curvature(self, tangents, a, b, chord):
+        """Curvature of the circular arc leaving end a and entering end b along their tangents."""
+        turning = np.arccos(np.clip(-np.sum(tangents[a] * tangents[b], axis=1), -1, 1))
+        return 2 * np.sin(turning / 2) / np.maximum(chord, 1e-12)
+
+    def candidate_pairs(self, ends, tangents, curvature, lengths, dangling):
+        if len(dangling) < 2:
+            return np.empty((0, 2), dtype=int), np.empty(0)
+
+        # k nearest within max_gap rather than every pair within it, which is quadratic where ends pile up;
+        # the first neighbour is the end itself and missing neighbours come back as index len(dangling)
+        tree = cKDTree(ends[dangling])
+        _, neighbours = tree.query(ends[dangling], k=min(self.max_neighbours + 1, len(dangling)),
+                                   distance_upper_bound=self.max_gap)
+        rows = np.repeat(np.arange(len(dangling)), neighbours.shape[1])
+        neighbours = neighbours.ravel()
+        found = (neighbours < len(dangling)) & (neighbours != rows)
+        pairs = np.unique(np.sort(np.column_stack([rows[found], neighbours[found]]), axis=1), axis=0)
+        pairs = dangling[pairs]
+        if len(pairs) == 0:
+            return np.empty((0, 2), dtype=int), np.empty(0)
+        a, b = pairs[:, 0], pairs[:, 1]
+
+        gap = ends[b] - ends[a]
+        distance = np.linalg.norm(gap, axis=1)
+        direction = gap / np.maximum(distance, 1e-12)[:, None]
+        alignment_a = np.sum(tangents[a] * direction, axis=1)
+        alignment_b = -np.sum(tangents[b] * direction, axis=1)
+
+        # both ends of one stroke may only close it when the stroke is long enough to be a loop
+        same_stroke = a // 2 == b // 2
+        valid = ((alignment_a >= self.min_alignment) & (alignment_b >= self.min_alignment)
+                 & (distance > self.snap_tolerance) & (~same_stroke | (lengths[a] > 3 * distance)))
+
+        # misalignment, curvature disagreement accumulated over the gap (both in radians) and relative gap size
+        bridge = self.gap_curvature(tangents, a, b, distance)
+        mismatch = (np.abs(bridge - curvature[a]) + np.abs(bridge - curvature[b])) * distance
+        cost = (2 - alignment_a - alignment_b) + mismatch + distance / self.max_gap
+        return pairs[valid], cost[valid]
+
+    def select_pairs(self, pairs, cost):
+        used = set()
+        selected = []
+        for index in np.argsort(cost, kind='stable'):
+            a, b = pairs[index]
+            if a in used or b in used:
+                continue
+            used.update((a, b))
+            selected.append((a, b))
+        return np.array(selected, dtype=int).reshape(-1, 2)
+
+    def control_points(self, ends, tangents, curvature, pairs):
+        a, b = pairs[:, 0], pairs[:, 1]
+        p0, p3 = ends[a], ends[b]
+        chord = np.linalg.norm(p3 - p0, axis=1)
+
+        # turning angle implied by the end tangents, refined by the osculating radius where it fits the chord
+        turning = np.arccos(np.clip(-np.sum(tangents[a] * tangents[b], axis=1), -1, 1))
+        mean_curvature = (curvature[a] + curvature[b]) / 2
+        arc_fits = mean_curvature * chord < 2
+        turning = np.where(arc_fits & (mean_curvature > 0), 2 * np.arcsin(np.clip(mean_curvature * chord / 2, 0, 1)), turning)
+
+        # handle length of the circular arc with this chord and turning angle; chord / 3 when straight
+        half_sine = np.sin(turning / 2)
+        handle = np.where(half_sine > 1e-6,
+                          4 / 3 * np.tan(turning / 4) * chord / (2 * np.maximum(half_sine, 1e-6)),
+                          chord / 3)
+
+        p1 = p0 + handle[:, None] * tangents[a]
+        p2 = p3 + handle[:, None] * tangents[b]
+        return np.stack([p0, p1, p2, p3], axis=1)
+
+    def complete(self):
+        if not self.strokes:
+            self.completions = []
+            return self.completions
+
+        ends, inner, outer, lengths = self.stroke_ends()
+        tangents, curvature = self.end_geometry(ends, inner, outer)
+        dangling = self.dangling_ends(ends)
+        pairs, cost = self.candidate_pairs(ends, tangents, curvature, lengths, dangling)
+        selected = self.select_pairs(pairs, cost)
+
+        self.completions = list(self.control_points(ends, tangents, curvature, selected))
+        return self.completions
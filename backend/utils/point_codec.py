@@ -0,0 +1,180 @@
+import bz2
+import lzma
+import struct
+import zlib
+from io import BytesIO
+import numpy as np
+
+# Framed columnar layout (all little-endian):
+#   header   magic, version, float itemsize, reserved, curve count, point count
+#   int32    curve ids                  [n_curves]
+#   uint32   curve offsets into columns [n_curves + 1]
+#   padding  up to an 8 byte boundary
+#   float    x column                   [n_points]
+#   float    y column                   [n_points]
+FRAME_MAGIC = b'CRVB'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<4sBBHII')
+FLOAT_DTYPES = {4: np.dtype('<f4'), 8: np.dtype('<f8')}
+
+NPY_MAGIC = b'\x93NUMPY'
+
+COMPRESSION_MAGIC = [
+    (b'\x1f\x8b', lambda: zlib.decompressobj(31)),
+    (b'BZh', bz2.BZ2Decompressor),
+    (b'\xfd7zXZ\x00', lzma.LZMADecompressor),
+]
+# Largest decompressed upload, so a small compressed body cannot inflate without bound
+MAX_DECOMPRESSED_BYTES = 256 * 2 ** 20
+
+class PayloadTooLarge(ValueError):
+    pass
+
+class InvalidPointData(ValueError):
+    pass
+
+def frame_layout(n_curves, n_points, itemsize):
+    """Byte offsets of each column in a frame with the given dimensions."""
+    ids_offset = FRAME_HEADER.size
+    offsets_offset = ids_offset + 4 * n_curves
+    x_offset = offsets_offset + 4 * (n_curves + 1)
+    x_offset += -x_offset % 8
+    y_offset = x_offset + itemsize * n_points
+    return ids_offset, offsets_offset, x_offset, y_offset, y_offset + itemsize * n_points
+
+def read_frame_header(buffer):
+    if len(buffer) < FRAME_HEADER.size:
+        raise InvalidPointData('Truncated curve frame')
+    magic, version, itemsize, _, n_curves, n_points = FRAME_HEADER.unpack_from(buffer, 0)
+    if magic != FRAME_MAGIC:
+        raise InvalidPointData('Not a curve frame')
+    if version != FRAME_VERSION:
+        raise InvalidPointData(f'Unsupported curve frame version {version}')
+    if itemsize not in FLOAT_DTYPES:
+        raise InvalidPointData(f'Unsupported float size {itemsize}')
+    return itemsize, n_curves, n_points
+
+def encode_frame(curve_ids, offsets, xs, ys, dtype=np.float64):
+    dtype = np.dtype(dtype).newbyteorder('<')
+    n_curves, n_points = len(curve_ids), len(xs)
+    _, _, x_offset, _, _ = frame_layout(n_curves, n_points, dtype.itemsize)
+
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, dtype.itemsize, 0, n_curves, n_points)
+    index = np.asarray(curve_ids, dtype='<i4').tobytes() + np.asarray(offsets, dtype='<u4').tobytes()
+    padding = b'\x00' * (x_offset - len(header) - len(index))
+    return b''.join([header, index, padding,
+                     np.asarray(xs, dtype=dtype).tobytes(),
+                     np.asarray(ys, dtype=dtype).tobytes()])
+
+def decode_frame(buffer):
+    """Return (curve_ids, offsets, xs, ys) as zero-copy views over the buffer."""
+    itemsize, n_curves, n_points = read_frame_header(buffer)
+    ids_offset, offsets_offset, x_offset, y_offset, end = frame_layout(n_curves, n_points, itemsize)
+    if len(buffer) < end:
+        raise InvalidPointData('Truncated curve frame')
+
+    dtype = FLOAT_DTYPES[itemsize]
+    curve_ids = np.frombuffer(buffer, dtype='<i4', count=n_curves, offset=ids_offset)
+    offsets = np.frombuffer(buffer, dtype='<u4', count=n_curves + 1, offset=offsets_offset)
+    xs = np.frombuffer(buffer, dtype=dtype, count=n_points, offset=x_offset)
+    ys = np.frombuffer(buffer, dtype=dtype, count=n_points, offset=y_offset)
+    if offsets[0] != 0 or offsets[-1] != n_points or np.any(np.diff(offsets.astype(np.int64)) < 0):
+        raise InvalidPointData('Invalid curve offsets')
+    return curve_ids, offsets, xs, ys
+
+def decode_npy(buffer):
+    """Read an (N, 3) [curve, x, y] or (N, 4) [curve, static, x, y] array."""
+    try:
+        array = np.load(BytesIO(buffer), allow_pickle=False)
+    except (ValueError, EOFError) as e:
+        raise InvalidPointData(f'Invalid .npy array: {e}') from e
+    if array.ndim != 2 or array.shape[1] not in (3, 4):
+        raise InvalidPointData('Expected an (N, 3) or (N, 4) point array')
+
+    curve_column = array[:, 0].astype(np.int64)
+    xs, ys = array[:, -2], array[:, -1]
+    order = np.argsort(curve_column, kind='stable')
+    curve_column, xs, ys = curve_column[order], xs[order], ys[order]
+
+    starts = np.flatnonzero(np.r_[True, curve_column[1:] != curve_column[:-1]])
+    offsets = np.r_[starts, len(curve_column)]
+    return curve_column[starts], offsets, xs, ys
+
+def decompress_streams(buffer, make_decompressor, max_size):
+    """Decompress the concatenated streams in ``buffer`` without ever holding more than ``max_size`` bytes of output."""
+    chunks = []
+    size = 0
+    data = buffer
+    while data:
+        decompressor = make_decompressor()
+        try:
+            chunk = decompressor.decompress(data, max_size - size + 1)
+        except (OSError, EOFError, lzma.LZMAError, zlib.error):
+            if chunks:
+                break  # bytes after a complete stream are ignored, as bz2 and lzma do
+            raise
+        size += len(chunk)
+        if size > max_size:
+            raise PayloadTooLarge(f'Upload decompresses to more than {max_size} bytes')
+        if not decompressor.eof:
+            raise EOFError('Compressed data ended before the end-of-stream marker was reached')
+        chunks.append(chunk)
+        data = decompressor.unused_data.lstrip(b'\x00')
+    return b''.join(chunks)
+
+def decompress(buffer, max_size=MAX_DECOMPRESSED_BYTES):
+    for magic, make_decompressor in COMPRESSION_MAGIC:
+        if buffer.startswith(magic):
+            return decompress_streams(buffer, make_decompressor, max_size)
+    # zlib streams have no fixed magic, only a header checksum
+    if len(buffer) > 2 and buffer[0] & 0x0f == 8 and (buffer[0] << 8 | buffer[1]) % 31 == 0:
+        try:
+            return decompress_streams(buffer, zlib.decompressobj, max_size)
+        except (zlib.error, EOFError):
+            pass
+    return buffer
+
+def decompressed_head(buffer, size):
+    """The first ``size`` bytes of ``buffer`` once decompressed, without inflating the rest."""
+    for magic, make_decompressor in COMPRESSION_MAGIC:
+        if buffer.startswith(magic):
+            try:
+                return make_decompressor().decompress(buffer, size)
+            except (OSError, EOFError, lzma.LZMAError, zlib.error):
+                return b''
+    if len(buffer) > 2 and buffer[0] & 0x0f == 8 and (buffer[0] << 8 | buffer[1]) % 31 == 0:
+        try:
+            return zlib.decompressobj().decompress(buffer, size)
+        except zlib.error:
+            pass
+    return buffer[:size]
+
+def is_point_data(buffer):
+    """Whether a (possibly compressed) upload holds a curve frame or an .npy array, whatever it claims to be."""
+    head = decompressed_head(buffer, max(len(FRAME_MAGIC), len(NPY_MAGIC)))
+    return head.startswith(FRAME_MAGIC) or head.startswith(NPY_MAGIC)
+
+def decode_points(buffer):
+    """Decode a (possibly compressed) binary upload into curve columns."""
+    buffer = decompress(buffer)
+    if buffer.startswith(FRAME_MAGIC):
+        return decode_frame(buffer)
+    if buffer.startswith(NPY_MAGIC):
+        return decode_npy(buffer)
+    raise InvalidPointData('Unrecognised binary point format')
+
+def columns_to_curves(curve_ids, offsets, xs, ys):
+    """Curve id -> list of points. Empty curves are valid in a frame but dropped, as the pipeline has nothing to fit."""
+    points = np.column_stack([xs, ys]).astype(np.float64).tolist()
+    return {
+        int(curve_id): list(map(tuple, points[offsets[i]:offsets[i + 1]]))
+        for i, curve_id in enumerate(curve_ids)
+        if offsets[i + 1] > offsets[i]
+    }
+
+def curves_to_columns(curves):
+    curve_ids = np.fromiter(curves.keys(), dtype=np.int64, count=len(curves))
+    lengths = np.fromiter((len(points) for points in curves.values()), dtype=np.int64, count=len(curves))
+    offsets = np.r_[0, np.cumsum(lengths)]
+    points = np.array([point for points in curves.values() for point in points], dtype=np.float64).reshape(-1, 2)
+    return curve_ids, offsets, points[:, 0], points[:, 1]
@@ -1,61 +1,26 @@
-import math
 import heapq
 import matplotlib.pyplot as plt
 import numpy as np
-from scipy.spatial.distance import cdist
+from utils.geometry import (edge_lengths, point_distances, regular_polygons, sample_segments,
+                            segment_distances, triangle_areas, turning_angles)
+
+# Elements of the largest distance temporary regular_polygon_scores builds at once
+ANGLE_BLOCK_ELEMENTS = 2 ** 18
 
 class PolygonDetection:
     def __init__(self, error_threshold=150):
         self.error_threshold = error_threshold
         self.polygons = []
+        self.polygon_contours = []
         
-    def sample_points_along_segment(self, p1, p2, num_points=30):
-        return np.linspace(p1, p2, num_points)
-
-    def calculate_angle_between_lines(self, line1, line2):
-        def vector_from_line(line):
-            (x1, y1), (x2, y2) = line
-            return (x2 - x1, y2 - y1)
-
-        common_points = set(line1) & set(line2)
-        if len(common_points) == 0:
-            return None
-
-        vec1 = vector_from_line(line1)
-        vec2 = vector_from_line(line2)
-
-        magnitude1 = math.sqrt(vec1[0]**2 + vec1[1]**2)
-        magnitude2 = math.sqrt(vec2[0]**2 + vec2[1]**2)
-
-        if magnitude1 == 0 or magnitude2 == 0:
-            return None
-
-        dot_product = vec1[0] * vec2[0] + vec1[1] * vec2[1]
-        cos_theta = dot_product / (magnitude1 * magnitude2)
+    def sample_lines(self, lines, num_points=30):
+        """Points spaced along every line, shape (len(lines), num_points, 2)."""
+        return sample_segments([p1 for p1, _ in lines], [p2 for _, p2 in lines], num_points)
 
-        cos_theta = min(1, max(-1, cos_theta))
-
-        angle = math.degrees(math.acos(cos_theta))
-        return angle
-
-    def are_points_close(self, p1, p2, tolerance=1):
-        return np.linalg.norm(np.array(p1) - np.array(p2)) < tolerance
-
-    def calculate_area_contribution(self, p1, p2, p3):
-        """Calculate the signed area of the triangle formed by p1, p2, p3."""
-        return 0.5 * abs(p1[0] * (p2[1] - p3[1]) + p2[0] * (p3[1] - p1[1]) + p3[0] * (p1[1] - p2[1]))
-
-    def calculate_internal_angle(self, p1, p2, p3):
-        vec1 = np.array(p2) - np.array(p1)
-        vec2 = np.array(p3) - np.array(p2)
-        dot_product = np.dot(vec1, vec2)
-        magnitude1 = np.linalg.norm(vec1)
-        magnitude2 = np.linalg.norm(vec2)
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0
-        cos_theta = dot_product / (magnitude1 * magnitude2)
-        cos_theta = min(1, max(-1, cos_theta))
-        return math.degrees(math.acos(cos_theta))
+    def line_errors(self, lines, polygon):
+        """Mean distance from each line's samples to the nearest polygon vertex."""
+        samples = self.sample_lines(lines)
+        return point_distances(samples.reshape(-1, 2), polygon).min(axis=1).reshape(samples.shape[:2]).mean(axis=1).tolist()
 
     def process_polygons(self, polygons):
         vertices_arr = []
@@ -64,117 +29,97 @@ class PolygonDetection:
         for points in polygons:
             lines = [(points[i], points[(i + 1) % len(points)]) for i in range(len(points))]
 
-            concave_vertices = []
-            for i in range(len(points)):
-                p_prev = points[i - 1]
-                p_curr = points[i]
-                p_next = points[(i + 1) % len(points)]
-                angle = self.calculate_internal_angle(p_prev, p_curr, p_next)
-                if angle > 180:
-                    concave_vertices.append(p_curr)
-
-            points = [p for p in points if p not in concave_vertices]
-
-            points = self.filter_points(np.array(points))
-            # print(points)
-            heap = []
-            for i in range(len(points)):
-                p_prev = points[i - 1]
-                p_curr = points[i]
-                p_next = points[(i + 1) % len(points)]
-                area_contribution = self.calculate_area_contribution(p_prev, p_curr, p_next)
-                heapq.heappush(heap, (-area_contribution, p_curr))
+            points = np.array(points, dtype=float)
+            angles = turning_angles(np.roll(points, 1, axis=0), points, np.roll(points, -1, axis=0))
+            points = points[angles <= 180]
+
+            points = self.filter_points(points)
+            areas = triangle_areas(np.roll(points, 1, axis=0), points, np.roll(points, -1, axis=0))
+            close = point_distances(points, points) < 1
 
+            # largest area contribution first, earlier vertex on ties
+            kept = []
             vertices = set()
-            while heap:
-                score, vertex = heapq.heappop(heap)
-                # print(score, vertex)
-                vertex_tuple = tuple(vertex)  # Convert numpy array to a tuple
-                if not any(self.are_points_close(vertex, np.array(v)) for v in vertices):
-                    vertices.add(vertex_tuple)
+            for i in np.argsort(-areas, kind='stable'):
+                if not close[i, kept].any():
+                    kept.append(i)
+                    vertices.add(tuple(points[i]))
 
             vertices = np.array([np.array(v) for v in vertices])
             vertices_arr.append(vertices)
             lines_arr.append(lines)
         return vertices_arr, lines_arr
     
-    def calculate_distance(self, p1, p2):
-        """Calculate the Euclidean distance between two points."""
-        return np.linalg.norm(p2 - p1)
-
     def filter_points(self, points):
-        # print(points)
-        distances = [self.calculate_distance(points[i], points[(i+1) % len(points)]) for i in range(len(points))]
+        distances = edge_lengths(points)
         avg_distance = np.mean(distances)
         threshold = 0.85 * avg_distance
         i = 0
         while i < len(points):
             if distances[i] < threshold:
-                dist_prev = self.calculate_distance(points[(i-1 + len(points)) % len(points)], points[i])
-                dist_next = self.calculate_distance(points[(i+1) % len(points)], points[(i+2) % len(points)])
-                
+                dist_prev = distances[i - 1]
+                dist_next = distances[(i + 1) % len(points)]
+
                 if dist_prev <= dist_next:
                     points = np.delete(points, i, axis=0)
                 else:
                     points = np.delete(points, (i+1) % len(points), axis=0)
-                
-                distances = [self.calculate_distance(points[j], points[(j+1) % len(points)]) for j in range(len(points))]
+
+                distances = edge_lengths(points)
             else:
                 i += 1
-        
+
         return points
 
-    def calculate_angle(self, point, centroid):
-        return np.arctan2(point[1] - centroid[1], point[0] - centroid[0])
+    def regular_polygon_scores(self, vertices, samples, centroid, radius, n_vertices, angles):
+        """Vertex distance sum plus mean sample-to-edge distance for the regular polygon at every rotation.
+
+        On a regular polygon the nearest vertex to a point is the angularly
+        nearest one, and the nearest edge is the edge of the point's angular
+        sector or one of its two neighbours, so only those are measured.
+        Rotations are scored in blocks so temporaries stay a few MB.
+        """
+        step = 2 * np.pi / n_vertices
+        vertex_phase = np.arctan2(*(vertices - centroid).T[::-1])
+        sample_phase = np.arctan2(*(samples - centroid).T[::-1])
+        near_edges = np.arange(-1, 2) if n_vertices > 3 else np.arange(n_vertices)
+        block = int(np.clip(ANGLE_BLOCK_ELEMENTS // (len(samples) * len(near_edges)), 1, 360))
+
+        scores = np.empty(len(angles))
+        for start in range(0, len(angles), block):
+            rotations = angles[start:start + block]
+            corners = regular_polygons(centroid, [radius], n_vertices, rotations)[0]
+            blocks = np.arange(len(rotations))[:, None]
+
+            nearest = np.rint((vertex_phase[None, :] - rotations[:, None]) / step).astype(np.intp) % n_vertices
+            vertex_scores = np.linalg.norm(vertices[None] - corners[blocks, nearest], axis=-1).sum(axis=-1)
+
+            sector = np.floor((sample_phase[None, :] - rotations[:, None]) / step).astype(np.intp)
+            edges = (sector[..., None] + near_edges) % n_vertices
+            line_scores = np.sqrt(segment_distances(samples[None, :, None, :], corners[blocks[..., None], edges],
+                                                    corners[blocks[..., None], (edges + 1) % n_vertices],
+                                                    squared=True)[..., 0, :].min(axis=-1)).mean(axis=-1)
+            scores[start:start + block] = vertex_scores + line_scores
+        return scores
 
     def get_best_fit_polygon(self, vertices, lines):
+        """Regular polygon minimising vertex distance plus mean line-to-edge distance over a radius and rotation grid."""
         centroid = np.mean(vertices, axis=0)
         distances = np.linalg.norm(vertices - centroid, axis=1)
         average_radius = np.mean(distances)
         n_vertices = len(vertices)
 
-        def generate_regular_polygon(centroid, radius, n_vertices, rotation_angle=0):
-            angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False) + rotation_angle
-            return np.array([
-                [centroid[0] + radius * np.cos(angle), centroid[1] + radius * np.sin(angle)]
-                for angle in angles
-            ])
-
-        def fit_score(vertices, approx_vertices):
-            return np.sum(cdist(vertices, approx_vertices, 'euclidean').min(axis=1))
-
-        def line_fit_score(lines, approx_vertices):
-            total_distance = 0
-            total_samples = 0
-
-            for line in lines:
-                p1, p2 = line
-                segment_points = self.sample_points_along_segment(p1, p2)
-                distances = cdist(segment_points, approx_vertices, 'euclidean').min(axis=1)
-                total_distance += np.sum(distances)
-                total_samples += len(distances)
-
-            return total_distance / total_samples
+        radii = np.linspace(average_radius - 1, average_radius + 1, 5)
+        angles = np.linspace(0, 2 * np.pi, 360)
+        samples = self.sample_lines(lines).reshape(-1, 2)
 
-        best_fit_polygon = None
-        best_fit_score = float('inf')
-        best_rotation_angle = 0
-        best_radius = average_radius
+        scores = np.empty((len(radii), len(angles)))
+        for r, radius in enumerate(radii):
+            scores[r] = self.regular_polygon_scores(vertices, samples, centroid, radius, n_vertices, angles)
 
-        radii = np.linspace(average_radius - 1, average_radius + 1, 5)
-        for radius in radii:
-            for angle in np.linspace(0, 2 * np.pi, 360):
-                approx_vertices = generate_regular_polygon(centroid, radius, n_vertices, rotation_angle=angle)
-                vertex_score = fit_score(vertices, approx_vertices)
-                line_score = line_fit_score(lines, approx_vertices)
-                score = vertex_score + line_score
-                if score < best_fit_score:
-                    best_fit_score = score
-                    best_fit_polygon = approx_vertices
-                    best_rotation_angle = angle
-                    best_radius = radius
-
-        return best_fit_polygon, best_rotation_angle, best_radius
+        r, a = np.unravel_index(np.argmin(scores), scores.shape)
+        best_fit_polygon = regular_polygons(centroid, radii[r:r + 1], n_vertices, angles[a:a + 1])[0, 0]
+        return best_fit_polygon, angles[a], radii[r]
 
     def get_best_fit_rectangle(self, vertices, lines):
         if len(vertices) != 4:
@@ -222,42 +167,56 @@ class PolygonDetection:
         return star_points, best_rotation_angle, best_radius
 
 
-    def process_polygons_with_fit(self, vertices_list, lines_list):
-        valid_polygons = []
-        rejected_polygons = []
-        remaining_segments = []
+    def fit_polygon(self, vertices, lines):
+        """Best template for one polygon as ``(vertices, rotation, radius, type)``."""
+        best_radius = None
+        polygon_type = "polygon"
+
+        if len(vertices) % 2 == 0 and len(vertices) >= 8:
+            best_fit_polygon, best_rotation_angle, best_radius = self.get_best_fit_star_shape(vertices, lines)
+            if best_fit_polygon is None:
+                best_fit_polygon, best_rotation_angle, best_radius = self.get_best_fit_polygon(vertices, lines)
+            else:
+                polygon_type = "star"
+
+        elif len(vertices) == 4:
+            best_fit_polygon, best_rotation_angle, _ = self.get_best_fit_rectangle(vertices, lines)
+            if best_fit_polygon is not None:
+                polygon_type = "rectangle"
+            else:
+                best_fit_polygon, best_rotation_angle, best_radius = self.get_best_fit_polygon(vertices, lines)
+
+        else:
+            best_fit_polygon, best_rotation_angle, best_radius = self.get_best_fit_polygon(vertices, lines)
+
+        return best_fit_polygon, best_rotation_angle, best_radius, polygon_type
+
+    def fit_polygons(self, vertices_list, lines_list, fit_polygon=None):
+        """Fit a template to every polygon; acceptance is left to filter_polygon_fits.
+
+        ``fit_polygon`` replaces :meth:`fit_polygon`, e.g. with a cached version.
+        """
+        fit_polygon = fit_polygon or self.fit_polygon
+        fits = []
 
         for vertices, lines in zip(vertices_list, lines_list):
-            best_fit_polygon, best_rotation_angle, best_radius = None, None, None
             if len(vertices) == 0 or len(lines) == 0:
                 continue
 
-            polygon_type = "polygon"
+            fit = fit_polygon(vertices, lines)
+            line_errors = self.line_errors(lines, fit[0])
 
-            if len(vertices) % 2 == 0 and len(vertices) >= 8:
-                best_fit_polygon, best_rotation_angle, best_radius = self.get_best_fit_star_shape(vertices, lines)
-                if best_fit_polygon is None:
-                    best_fit_polygon, best_rotation_angle, best_radius = self.get_best_fit_polygon(vertices, lines)
-                else:
-                    polygon_type = "star"
-                    
-            elif len(vertices) == 4:
-                best_fit_polygon, best_rotation_angle, _ = self.get_best_fit_rectangle(vertices, lines)
-                if best_fit_polygon is not None:
-                    polygon_type = "rectangle"
-                else:
-                    best_fit_polygon, best_rotation_angle, best_radius = self.get_best_fit_polygon(vertices, lines)
+            fits.append((fit, line_errors, vertices, lines))
 
-            else:
-                best_fit_polygon, best_rotation_angle, best_radius = self.get_best_fit_polygon(vertices, lines)
+        return fits
 
-            line_errors = []
-            for line in lines:
-                p1, p2 = line
-                segment_points = self.sample_points_along_segment(p1, p2)
-                distances = cdist(segment_points, best_fit_polygon, 'euclidean').min(axis=1)
-                line_errors.append(np.mean(distances))
+    def filter_polygon_fits(self, fits):
+        valid_polygons = []
+        valid_contours = []
+        rejected_polygons = []
+        remaining_segments = []
 
+        for fit, line_errors, vertices, lines in fits:
             if any(error > self.error_threshold for error in line_errors):
                 rejected_polygons.append((vertices, lines))
                 for line in lines:
@@ -265,11 +224,16 @@ class PolygonDetection:
                 continue
 
             # Store the valid polygon with its type
-            valid_polygons.append((best_fit_polygon, best_rotation_angle, best_radius, polygon_type))
+            valid_polygons.append(fit)
+            valid_contours.append([line[0] for line in lines])
 
         self.polygons = valid_polygons  # Store the valid polygons
+        self.polygon_contours = valid_contours  # Drawn contour each polygon was fitted to
         return valid_polygons, rejected_polygons, remaining_segments
 
+    def process_polygons_with_fit(self, vertices_list, lines_list):
+        return self.filter_polygon_fits(self.fit_polygons(vertices_list, lines_list))
+
     def plot_all_polygons_with_symmetry(self):
         """
         Plot all the stored polygons along with their lines of symmetry.
@@ -350,12 +314,7 @@ class PolygonDetection:
             lines = remaining_polygons
             best_fit_polygon, best_rotation_angle, best_radius = self.get_best_fit_polygon(vertices, lines)
 
-            line_errors = []
-            for line in lines:
-                p1, p2 = line
-                segment_points = self.sample_points_along_segment(p1, p2)
-                distances = cdist(segment_points, best_fit_polygon, 'euclidean').min(axis=1)
-                line_errors.append(np.mean(distances))
+            line_errors = self.line_errors(lines, best_fit_polygon)
 
             if any(error > self.error_threshold for error in line_errors):
                 for line in lines:
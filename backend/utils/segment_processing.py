@@ -1,13 +1,15 @@
 import matplotlib.pyplot as plt
 import numpy as np
+from utils.geometry import close_pairs, slopes
 
-def are_approximately_equal(p1, p2, tol=5):
-    return np.linalg.norm(np.array(p1) - np.array(p2)) < tol
-
-def compute_slope(p1, p2):
-    if p2[0] == p1[0]:
-        return np.inf
-    return (p2[1] - p1[1]) / (p2[0] - p1[0])
+def shares_end_point(segments, tol):
+    """For each segment, the set of other segments with an end point closer than ``tol`` to one of its own."""
+    pairs = close_pairs(np.array(segments, dtype=float).reshape(-1, 2), tol) // 2
+    touching = [set() for _ in segments]
+    for i, j in pairs[pairs[:, 0] != pairs[:, 1]].tolist():
+        touching[i].add(j)
+        touching[j].add(i)
+    return touching
 
 class SegmentProcessor:
     def __init__(self, segments, tol=1):
@@ -23,28 +25,33 @@ class SegmentProcessor:
         used = set()
         segment_map = {}
         
+        if self.segments:
+            segment_slopes = slopes([start for start, _ in self.segments], [end for _, end in self.segments])
+            touching = shares_end_point(self.segments, 5)
+
         while len(used) < len(self.segments):
             for i, (start1, end1) in enumerate(self.segments):
                 if i not in used:
                     break
 
             collinear_group = [(start1, end1)]
+            group_indices = [i]
             used.add(i)
+            with np.errstate(invalid='ignore'):
+                # vertical segments have infinite slope and, as before, never merge
+                collinear = np.abs(segment_slopes[i] - segment_slopes) < self.tol
 
             while True:
                 merged = False
-                for j, (start2, end2) in enumerate(self.segments):
+                for j in np.flatnonzero(collinear):
                     if j in used:
                         continue
-                    
-                    if (np.abs(compute_slope(start1, end1) - compute_slope(start2, end2)) < self.tol):
-                        if any(are_approximately_equal(start, start2) or 
-                               are_approximately_equal(start, end2) or
-                               are_approximately_equal(end, start2) or 
-                               are_approximately_equal(end, end2) for start, end in collinear_group):
-                            collinear_group.append((start2, end2))
-                            used.add(j)
-                            merged = True
+
+                    if not touching[j].isdisjoint(group_indices):
+                        collinear_group.append(self.segments[j])
+                        group_indices.append(j)
+                        used.add(j)
+                        merged = True
 
                 if not merged:
                     break
@@ -55,7 +62,7 @@ class SegmentProcessor:
             min_y_idx = np.argmin(all_points[:, 1])
             max_y_idx = np.argmax(all_points[:, 1])
 
-            if np.abs(compute_slope(start1, end1)) < self.tol:
+            if np.abs(segment_slopes[i]) < self.tol:
                 merged_segments.append((tuple(all_points[min_idx]), tuple(all_points[max_idx])))
                 segment_map[(tuple(all_points[min_idx]), tuple(all_points[max_idx]))] = collinear_group
             else:
@@ -67,13 +74,9 @@ class SegmentProcessor:
 
     def find_segments_with_common_vertices(self):
         common_vertex_segments = []
-        for i, (start1, end1) in enumerate(self.merged_segments):
-            for j, (start2, end2) in enumerate(self.merged_segments):
-                if i != j:
-                    if are_approximately_equal(start1, start2, self.tol) or are_approximately_equal(start1, end2, self.tol) or \
-                       are_approximately_equal(end1, start2, self.tol) or are_approximately_equal(end1, end2, self.tol):
-                        common_vertex_segments.append((start1, end1))
-                        break
+        if self.merged_segments:
+            touching = shares_end_point(self.merged_segments, self.tol)
+            common_vertex_segments = [segment for segment, others in zip(self.merged_segments, touching) if others]
         self.common_vertex_segments = common_vertex_segments
 
     def revert_to_original_segments(self):
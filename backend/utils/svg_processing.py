@@ -3,6 +3,7 @@ from collections import defaultdict
 from typing import List, Tuple
 import numpy as np
 import matplotlib.pyplot as plt
+from svgpathtools import Document, Line, CubicBezier, QuadraticBezier, Arc
 
 class SVGProcessor:
     def __init__(self, csv_data: str):
@@ -11,7 +12,115 @@ class SVGProcessor:
 
     def extract_points_from_csv(self):
         csv_reader = csv.reader(self.csv_data.splitlines())
-        next(csv_reader)  # Skip the header
-        for row in csv_reader:
-            curve_index, static, x, y = int(row[0]), float(row[1]), float(row[2]), float(row[3])
+        for line_number, row in enumerate(csv_reader):
+            if not row:
+                continue
+            try:
+                # data/problems files store the curve index as a float and have no header
+                curve_index, static, x, y = int(float(row[0])), float(row[1]), float(row[2]), float(row[3])
+            except ValueError:
+                if line_number == 0:
+                    continue  # Skip the header
+                raise
             self.all_points.append((curve_index, static, x, y))
+
+class SVGPathSampler:
+    """Flatten SVG paths into curves, evaluating each segment type in one NumPy batch.
+
+    Per-segment sample counts keep the polyline within ``tolerance`` of the
+    curve (Wang's bound for Béziers, sagitta for arcs).
+    """
+
+    LINE, QUADRATIC, CUBIC, ARC = range(4)
+
+    def __init__(self, svg_data: str, tolerance: float = 0.5, max_samples: int = 512):
+        self.svg_data = svg_data
+        self.tolerance = tolerance
+        self.max_samples = max_samples
+        self.all_points = []
+
+    def segment_parameters(self, segments):
+        kinds = np.empty(len(segments), dtype=np.int8)
+        controls = np.zeros((len(segments), 4), dtype=complex)
+        arcs = np.zeros((len(segments), 7))
+
+        for i, segment in enumerate(segments):
+            if isinstance(segment, Line):
+                kinds[i] = self.LINE
+                controls[i, :2] = segment.start, segment.end
+            elif isinstance(segment, QuadraticBezier):
+                kinds[i] = self.QUADRATIC
+                controls[i, :3] = segment.start, segment.control, segment.end
+            elif isinstance(segment, CubicBezier):
+                kinds[i] = self.CUBIC
+                controls[i] = segment.start, segment.control1, segment.control2, segment.end
+            elif isinstance(segment, Arc):
+                kinds[i] = self.ARC
+                arcs[i] = (segment.center.real, segment.center.imag, segment.radius.real, segment.radius.imag,
+                           np.radians(segment.rotation), np.radians(segment.theta), np.radians(segment.delta))
+            else:
+                raise ValueError(f'Unsupported SVG segment {type(segment).__name__}')
+        return kinds, controls, arcs
+
+    def sample_counts(self, kinds, controls, arcs):
+        tol = self.tolerance
+        second_diff = np.abs(controls[:, :-2] - 2 * controls[:, 1:-1] + controls[:, 2:])
+        counts = np.ones(len(kinds))
+
+        quadratic = kinds == self.QUADRATIC
+        counts[quadratic] = np.sqrt(second_diff[quadratic, 0] / (4 * tol))
+
+        cubic = kinds == self.CUBIC
+        counts[cubic] = np.sqrt(0.75 * second_diff[cubic].max(axis=1) / tol)
+
+        arc = kinds == self.ARC
+        max_radius = np.maximum(np.abs(arcs[arc, 2]), np.abs(arcs[arc, 3]))
+        step = 2 * np.arccos(np.clip(1 - tol / np.maximum(max_radius, tol), -1, 1))
+        counts[arc] = np.abs(arcs[arc, 6]) / np.maximum(step, 1e-9)
+
+        return np.clip(np.ceil(counts), 1, self.max_samples).astype(np.int64)
+
+    def sample_subpath(self, segments):
+        kinds, controls, arcs = self.segment_parameters(segments)
+        counts = self.sample_counts(kinds, controls, arcs)
+
+        offsets = np.r_[0, np.cumsum(counts)]
+        seg = np.repeat(np.arange(len(segments)), counts)
+        t = (np.arange(offsets[-1]) - offsets[seg]) / counts[seg]
+        s = 1 - t
+        points = np.empty(len(t), dtype=complex)
+
+        mask = kinds[seg] == self.LINE
+        p = controls[seg[mask]]
+        points[mask] = s[mask] * p[:, 0] + t[mask] * p[:, 1]
+
+        mask = kinds[seg] == self.QUADRATIC
+        p, tm, sm = controls[seg[mask]], t[mask], s[mask]
+        points[mask] = sm ** 2 * p[:, 0] + 2 * sm * tm * p[:, 1] + tm ** 2 * p[:, 2]
+
+        mask = kinds[seg] == self.CUBIC
+        p, tm, sm = controls[seg[mask]], t[mask], s[mask]
+        points[mask] = (sm ** 3 * p[:, 0] + 3 * sm ** 2 * tm * p[:, 1]
+                        + 3 * sm * tm ** 2 * p[:, 2] + tm ** 3 * p[:, 3])
+
+        mask = kinds[seg] == self.ARC
+        cx, cy, rx, ry, phi, theta, delta = arcs[seg[mask]].T
+        angle = theta + t[mask] * delta
+        cos_phi, sin_phi = np.cos(phi), np.sin(phi)
+        points[mask] = (rx * cos_phi * np.cos(angle) - ry * sin_phi * np.sin(angle) + cx
+                        + 1j * (rx * sin_phi * np.cos(angle) + ry * cos_phi * np.sin(angle) + cy))
+
+        points = np.append(points, segments[-1].end)
+        return np.column_stack([points.real, points.imag])
+
+    def extract_points_from_svg(self):
+        # Document applies the transforms of each element and its groups, svgstr2paths drops them
+        paths = Document.from_svg_string(self.svg_data).paths()
+        curve_index = 0
+        for path in paths:
+            for subpath in path.continuous_subpaths():
+                if len(subpath) == 0:
+                    continue
+                for x, y in self.sample_subpath(list(subpath)):
+                    self.all_points.append((curve_index, 0.0, float(x), float(y)))
+                curve_index += 1
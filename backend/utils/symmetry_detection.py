@@ -0,0 +1,120 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from utils.geometry import arc_lengths
+
+
+class SymmetryDetector:
+    """Reflection and rotation symmetry of closed contours from their radial signature.
+
+    Every contour is resampled to ``num_samples`` points evenly spaced by arc
+    length, so a reflection becomes a reversal of the signature and a k-fold
+    rotation a cyclic shift by N/k. Both are read off FFT correlations, which
+    costs O(N log N) per shape and runs for all shapes in one batch. A
+    symmetric radial signature does not imply a mirror symmetric shape, so
+    each candidate axis is confirmed by mirroring the contour across it:
+    the mean distance from the mirrored samples to the contour must stay
+    within ``mirror_tolerance`` of the mean radius.
+    """
+
+    def __init__(self, num_samples=256, threshold=0.9, circular_tolerance=0.03, max_rotation_order=12,
+                 mirror_tolerance=0.05):
+        self.num_samples = num_samples
+        self.threshold = threshold
+        self.mirror_tolerance = mirror_tolerance
+        self.circular_tolerance = circular_tolerance
+        self.max_rotation_order = max_rotation_order
+
+    def resample_contour(self, points):
+        points = np.asarray(points, dtype=float)
+        if len(points) > 1 and np.array_equal(points[0], points[-1]):
+            points = points[:-1]
+
+        closed = np.vstack([points, points[:1]])
+        arc_length = arc_lengths(closed)
+        if arc_length[-1] == 0:
+            return np.repeat(points[:1], self.num_samples, axis=0)
+
+        s = np.linspace(0, arc_length[-1], self.num_samples, endpoint=False)
+        return np.column_stack([np.interp(s, arc_length, closed[:, 0]),
+                                np.interp(s, arc_length, closed[:, 1])])
+
+    def mirror_residuals(self, tree, contour, centroid, angles):
+        """Mean distance from the contour mirrored across each line through ``centroid`` at ``angles`` to the contour."""
+        c, s = np.cos(2 * np.asarray(angles)), np.sin(2 * np.asarray(angles))
+        reflections = np.stack([np.stack([c, s], axis=-1), np.stack([s, -c], axis=-1)], axis=-2)
+        mirrored = centroid + (contour - centroid) @ reflections
+        distances, _ = tree.query(mirrored)
+        return distances.mean(axis=-1)
+
+    def reflection_axes(self, contour, centroid, scores, mean_radius):
+        n = self.num_samples
+        peaks = (scores >= np.roll(scores, 1)) & (scores >= np.roll(scores, -1)) & (scores >= self.threshold)
+
+        tree = cKDTree(contour)
+        axes = []
+        for shift in np.flatnonzero(peaks):
+            # r(m) == r(shift - m) mirrors the contour about the point at shift / 2
+            anchor = (contour[(shift // 2) % n] + contour[((shift + 1) // 2) % n]) / 2
+            direction = anchor - centroid
+            # the peak places the axis to within a sample, refine it before judging the mirror image
+            candidates = np.arctan2(direction[1], direction[0]) + np.linspace(-0.06, 0.06, 25)
+            residuals = self.mirror_residuals(tree, contour, centroid, candidates)
+            if residuals.min() > self.mirror_tolerance * mean_radius:
+                continue
+            angle = candidates[int(np.argmin(residuals))] % np.pi
+            axes.append({'angle': float(angle), 'score': float(scores[shift])})
+
+        # shifts s and s + N describe the same line through the centroid
+        unique_axes = []
+        for axis in sorted(axes, key=lambda a: -a['score']):
+            if all(abs((axis['angle'] - other['angle'] + np.pi / 2) % np.pi - np.pi / 2) > np.pi / n
+                   for other in unique_axes):
+                unique_axes.append(axis)
+        return unique_axes
+
+    def rotation_order(self, scores):
+        n = self.num_samples
+        best_order, best_score = 1, 1.0
+        for order in range(2, self.max_rotation_order + 1):
+            lags = np.round(np.arange(1, order) * n / order).astype(int) % n
+            score = scores[lags].min()
+            if score >= self.threshold:
+                best_order, best_score = order, float(score)
+        return best_order, best_score
+
+    def detect_all(self, contours):
+        if len(contours) == 0:
+            return []
+
+        resampled = np.array([self.resample_contour(points) for points in contours])
+        centroids = resampled.mean(axis=1)
+        radii = np.linalg.norm(resampled - centroids[:, None, :], axis=2)
+
+        mean_radius = radii.mean(axis=1, keepdims=True)
+        signature = radii - mean_radius
+        energy = np.sum(signature ** 2, axis=1, keepdims=True)
+        circular = np.sqrt(energy[:, 0] / self.num_samples) <= self.circular_tolerance * np.maximum(mean_radius[:, 0], 1e-12)
+
+        spectrum = np.fft.rfft(signature, axis=1)
+        safe_energy = np.where(energy > 0, energy, 1)
+        reflection_scores = np.fft.irfft(spectrum * spectrum, n=self.num_samples, axis=1) / safe_energy
+        rotation_scores = np.fft.irfft(spectrum * np.conj(spectrum), n=self.num_samples, axis=1) / safe_energy
+
+        results = []
+        for i in range(len(contours)):
+            result = {'centroid': [float(centroids[i, 0]), float(centroids[i, 1])], 'circular': bool(circular[i])}
+            if circular[i]:
+                result.update({'reflection_axes': [], 'rotation_order': None, 'rotation_score': 1.0})
+            else:
+                order, score = self.rotation_order(rotation_scores[i])
+                result.update({
+                    'reflection_axes': self.reflection_axes(resampled[i], centroids[i], reflection_scores[i],
+                                                            mean_radius[i, 0]),
+                    'rotation_order': order,
+                    'rotation_score': score,
+                })
+            results.append(result)
+        return results
+
+    def detect(self, points):
+        return self.detect_all([points])[0]